@@ -0,0 +1,113 @@
+"""
+Function: Latency-aware selection of CMAP database servers.
+"""
+
+
+import random
+import threading
+from collections import deque
+import numpy as np
+from .resilience import get_breaker, CircuitBreaker
+
+
+
+class ServerStats(object):
+    """
+    Keeps the exponentially weighted moving averages (EWMA) of a server's response time and error rate,
+    along with a bounded window of recent response times (used to estimate latency percentiles).
+    """
+
+    def __init__(self, alpha=0.2, window=200):
+        """
+        :param float alpha: EWMA smoothing factor (weight of the most recent observation).
+        :param int window: number of recent response times kept for percentile estimates.
+        """
+        self.alpha = alpha
+        self.latency = None
+        self.errorRate = 0.
+        self.count = 0
+        self.recent = deque(maxlen=window)
+
+
+    def record(self, latency, ok):
+        """Updates the server statistics with the outcome of a single request."""
+        self.count += 1
+        self.errorRate = (1 - self.alpha) * self.errorRate + self.alpha * (0. if ok else 1.)
+        if ok:
+            self.latency = latency if self.latency is None else (1 - self.alpha) * self.latency + self.alpha * latency
+            self.recent.append(latency)
+
+
+    def percentile(self, q):
+        """Returns the q-th percentile of the recent response times [seconds], or None if no data."""
+        if len(self.recent) < 1: return None
+        return float(np.percentile(np.array(self.recent), q))
+
+
+
+class ServerBalancer(object):
+    """
+    Ranks the CMAP servers by their recent performance (tracked separately for each API endpoint, `baseURL`).
+    Servers with an open circuit breaker are deprioritized, servers that have not been tried yet are explored first,
+    and the rest are ordered by their EWMA latency penalized by their EWMA error rate.
+    """
+
+    def __init__(self, errorPenalty=10, minSamples=5, defaultHedgeDelay=2.):
+        """
+        :param float errorPenalty: weight of the error rate in the server score.
+        :param int minSamples: minimum number of observations before a latency percentile is trusted.
+        :param float defaultHedgeDelay: hedging delay used until enough latencies are observed [seconds].
+        """
+        self.errorPenalty = errorPenalty
+        self.minSamples = minSamples
+        self.defaultHedgeDelay = defaultHedgeDelay
+        self._stats = {}
+        self._lock = threading.Lock()
+
+
+    def _get(self, server):
+        if server not in self._stats: self._stats[server] = ServerStats()
+        return self._stats[server]
+
+
+    def record(self, server, latency, ok, baseURL=None):
+        """Records the outcome of a single request sent to a server."""
+        with self._lock:
+            self._get((baseURL, server)).record(latency, ok)
+
+
+    def score(self, server, baseURL=None):
+        """Returns the server score (lower is better)."""
+        with self._lock:
+            stats = self._get((baseURL, server))
+            if stats.latency is None: return 0. if stats.count == 0 else float('inf')
+            return stats.latency * (1 + self.errorPenalty * stats.errorRate)
+
+
+    def rank(self, servers, baseURL=None):
+        """Returns the list of servers ordered from the most to the least preferred one."""
+        servers = list(dict.fromkeys(servers))
+        random.shuffle(servers)   # break ties randomly
+        return sorted(servers, key=lambda s: (get_breaker(s, baseURL).state == CircuitBreaker.OPEN, self.score(s, baseURL)))
+
+
+    def hedge_delay(self, server, q=95, baseURL=None):
+        """Returns the time to wait for a server response before sending a hedged request [seconds]."""
+        with self._lock:
+            stats = self._get((baseURL, server))
+            if len(stats.recent) < self.minSamples: return self.defaultHedgeDelay
+            return stats.percentile(q)
+
+
+    def stats(self):
+        """Returns a dictionary summarizing the statistics of each server, keyed by (baseURL, server)."""
+        with self._lock:
+            return {
+                   s: {'latency': st.latency, 'errorRate': st.errorRate, 'count': st.count, 'p95': st.percentile(95)}
+                   for s, st in self._stats.items()
+                   }
+
+
+
+# shared by all client instances
+BALANCER = ServerBalancer()
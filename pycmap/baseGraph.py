@@ -10,10 +10,10 @@ Function: Abstraction of base class for graphs.
 from abc import ABCMeta, abstractmethod
 import os
 from .common import inline, get_vizEngine, get_figure_dir 
+from .staticExport import save_static
+from .colorMaps import PALETTES
 import numpy as np
 import pandas as pd
-import matplotlib as plt
-import matplotlib.cm as cm
 from bokeh.io import output_notebook
 import plotly
 
@@ -110,12 +110,12 @@ class BaseGraph(object):
         init_notebook_mode(connected=False)
   
 
-    def _save_plotly_(self, go, data, layout):
+    def _save_plotly_(self, go, data, layout, frames=None):
         """
-        Saves a plotly figure on local disk.
+        Saves a plotly figure (optionally with animation frames) on local disk.
         Not meant to be called by user.
         """
-        fig = go.Figure(data=data, layout=layout)
+        fig = go.Figure(data=data, layout=layout, frames=frames)
         if not self.__plotlyConfig.get('staticPlot'):
             if inline(): 
                 self.enable_plotly_in_cell()              
@@ -123,7 +123,7 @@ class BaseGraph(object):
             else:
                 plotly.offline.plot(fig, config=self.plotlyConfig, filename=get_figure_dir() + self.variable + '.html')
         else:
-            plotly.io.write_image(fig, get_figure_dir() + self.variable + '.png')
+            save_static(fig, get_figure_dir() + self.variable + '.png')
 
 
     def _save_figure_factory_(self, fig):
@@ -139,7 +139,7 @@ class BaseGraph(object):
             else:
                 plotly.offline.plot(fig, config=self.plotlyConfig, filename=get_figure_dir() + fname + '.html')
         else:
-            plotly.io.write_image(fig, get_figure_dir() + fname + '.png')
+            save_static(fig, get_figure_dir() + fname + '.png')
 
 
     @property
@@ -300,19 +300,14 @@ class BaseGraph(object):
         
     @cmap.setter
     def cmap(self, cmap):
-        """Gets cmap as string (matplotlib colormap names) or cmocean colormap and makes it compatible with suppoerted vizEngine."""
-        colormap =cm.get_cmap(cmap)        
+        """
+        Gets cmap as string (matplotlib colormap names) or cmocean colormap and makes it compatible with suppoerted vizEngine.
+        The palettes are built once per colormap and then taken from the palette registry (see `colorMaps.PaletteRegistry`).
+        """
         if get_vizEngine().lower().strip() == 'bokeh':     
-            paletteName = [plt.colors.rgb2hex(m) for m in colormap(np.arange(colormap.N))]
-            cmap = paletteName
+            cmap = PALETTES.bokeh(cmap)
         elif get_vizEngine().lower().strip() == 'plotly':
-            pl_entries = 255
-            h = 1.0/(pl_entries-1)
-            pl_colorscale = []
-            for k in range(pl_entries):
-                C = list(map(np.uint8, np.array(colormap(k*h)[:3])*255))
-                pl_colorscale.append([k*h, 'rgb'+str((C[0], C[1], C[2]))])
-            cmap = pl_colorscale
+            cmap = PALETTES.plotly(cmap)
         self.__cmap = cmap                        
 
     @property
@@ -7,12 +7,84 @@ Function: Associate colormap to variables.
 """
 
 
+import threading
+from functools import lru_cache
+import numpy as np
+import matplotlib
 import cmocean
 
 
 
 
+class PaletteRegistry(object):
+    """
+    Builds the lookup tables of named colormaps once and memoizes them per colormap name and number of entries.
+    Each colormap is stored as a compact uint8 RGB array, along with its hex (bokeh) and colorscale (plotly) forms.
+    The returned tables are shared and must not be modified.
+    """
 
+    def __init__(self):
+        self._tables = {}
+        self._lock = threading.Lock()
+
+
+    @staticmethod
+    def _key(cmap):
+        """Colormap objects are not hashable; they are registered by name."""
+        return cmap if isinstance(cmap, str) else cmap.name
+
+
+    @staticmethod
+    def _resolve(cmap):
+        """Returns the colormap object; names are looked up in the matplotlib colormap registry."""
+        return matplotlib.colormaps[cmap] if isinstance(cmap, str) else cmap
+
+
+    def _get(self, form, cmap, entries, build):
+        key = (form, self._key(cmap), entries)
+        table = self._tables.get(key)
+        if table is None:
+            table = build()
+            with self._lock:
+                self._tables[key] = table
+        return table
+
+
+    def lut(self, cmap, entries=256):
+        """Returns the colormap sampled at `entries` evenly spaced points as a read-only uint8 array of shape (entries, 3)."""
+        def build():
+            colormap = self._resolve(cmap)
+            table = np.round(colormap(np.linspace(0, 1, entries))[:, :3] * 255).astype(np.uint8)
+            table.setflags(write=False)
+            return table
+        return self._get('lut', cmap, entries, build)
+
+
+    def bokeh(self, cmap, entries=None):
+        """Returns the colormap as a list of hex color strings (bokeh palette); by default one entry per colormap color."""
+        def build():
+            n = entries or self._resolve(cmap).N
+            return ['#%02x%02x%02x' % tuple(c) for c in self.lut(cmap, n).tolist()]
+        return self._get('hex', cmap, entries, build)
+
+
+    def plotly(self, cmap, entries=255):
+        """Returns the colormap as a plotly colorscale (list of [position, 'rgb(r, g, b)'] pairs)."""
+        def build():
+            colormap = self._resolve(cmap)
+            positions = np.linspace(0, 1, entries)
+            colors = (colormap(positions)[:, :3] * 255).astype(np.uint8).tolist()
+            return [[float(p), 'rgb(%d, %d, %d)' % tuple(c)] for p, c in zip(positions, colors)]
+        return self._get('plotly', cmap, entries, build)
+
+
+
+# shared by all graph objects
+PALETTES = PaletteRegistry()
+
+
+
+@lru_cache(maxsize=None)
 def getPalette(varName):
     paletteName = cmocean.cm.balance
     if varName.find('picoeukaryote') != -1:
@@ -14,6 +14,10 @@ import numpy as np
 import pandas as pd
 import webbrowser
 import IPython
+import time
+import threading
+from collections import OrderedDict
+from .sketch import QuantileSketch
 
 MAX_ROWS = 2000000
 MAX_SAMPLE_SOURCE = 500000
@@ -78,10 +82,88 @@ def canvas_rect(dw, dh):
         return w, h
 
 
-def get_data_limits(data, quant=0.05):
-        """Returns low and high quantile limits of a numeric array."""
-        data = np.array(data).flatten()
-        return np.nanquantile(data, quant), np.nanquantile(data, 1-quant)
+# data limits keyed by (table, variable, space-time box); see `get_data_limits`
+# the least recently used entries are evicted beyond DATA_LIMITS_CACHE_SIZE entries, and entries expire after 
+# DATA_LIMITS_TTL seconds so that tables updated in near-real-time are not plotted with stale limits
+DATA_LIMITS_CACHE_SIZE = 256
+DATA_LIMITS_TTL = 3600
+_dataLimitsCache = OrderedDict()
+_dataLimitsLock = threading.Lock()
+
+
+def clear_data_limits_cache():
+        """Removes all of the cached data limits (see `get_data_limits`)."""
+        with _dataLimitsLock:
+                _dataLimitsCache.clear()
+
+def get_data_limits(data, quant=0.05, key=None):
+        """
+        Returns low and high quantile limits of a numeric array. 
+        The quantiles are estimated in a single pass by a mergeable sketch (see sketch.QuantileSketch) rather than a full sort.
+        If `key` (e.g. table, variable, and the query space-time box) is given, the limits are cached and reused for the same key
+        (for up to DATA_LIMITS_TTL seconds; see also `clear_data_limits_cache`).
+        """
+        if key is not None:
+                with _dataLimitsLock:
+                        cached = _dataLimitsCache.get((key, quant))
+                        if cached is not None and time.monotonic() - cached[0] < DATA_LIMITS_TTL:
+                                _dataLimitsCache.move_to_end((key, quant))
+                                return cached[1]
+        sketch = QuantileSketch(k=1024)
+        sketch.update(pd.to_numeric(pd.Series(np.asarray(data).ravel()), errors='coerce').to_numpy(dtype=float))
+        limits = tuple(float(v) for v in sketch.quantile([quant, 1-quant]))
+        if key is not None: 
+                with _dataLimitsLock:
+                        _dataLimitsCache[(key, quant)] = (time.monotonic(), limits)
+                        _dataLimitsCache.move_to_end((key, quant))
+                        while len(_dataLimitsCache) > DATA_LIMITS_CACHE_SIZE: _dataLimitsCache.popitem(last=False)
+        return limits
+
+
+def significant_round(vals, digits):
+        """Rounds an array of floats to `digits` significant decimal digits (zeros, NaNs, and infinities are left as is)."""
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+                scale = 10. ** (digits - 1 - np.floor(np.log10(np.abs(vals))))
+                return np.where(np.isfinite(scale), np.round(vals * scale) / scale, vals)
+
+
+def float32_safe(vals, digits=6):
+        """
+        Returns True if a float array survives a float32 round trip at the precision it carries: every value has at most
+        `digits` significant decimal digits (float32 preserves 6), and rounding the float32 values back to that precision 
+        restores the original values. Integral values beyond 2**24 with more digits (e.g. 16777217) are therefore kept as float64.
+        """
+        vals = np.asarray(vals, dtype=np.float64)
+        if not np.allclose(significant_round(vals, digits), vals, rtol=1e-12, atol=0, equal_nan=True): return False
+        with np.errstate(over='ignore', invalid='ignore'):
+                restored = vals.astype(np.float32).astype(np.float64)
+        return np.allclose(significant_round(restored, digits), vals, rtol=1e-12, atol=0, equal_nan=True)
+
+
+def compact_dataframe(df, digits=6, maxUniqueRatio=0.5):
+        """
+        Reduces the memory footprint of a dataframe (in place) and returns it along with a report of the saved bytes.
+        Float columns are downcast to float32 only if their values carry at most `digits` significant digits (see `float32_safe`), 
+        integer columns are downcast to the smallest integer type, the `time` column is stored as datetime64, and string columns with 
+        repeated values (unique/total ratio below `maxUniqueRatio`) are dictionary-encoded as categoricals.
+        """
+        before = int(df.memory_usage(deep=True).sum())
+        for col in df.columns:
+                series = df[col]
+                if col == 'time':
+                        if not pd.api.types.is_datetime64_any_dtype(series):
+                                df[col] = pd.to_datetime(series, errors='coerce')
+                elif pd.api.types.is_float_dtype(series) and series.dtype != np.float32:
+                        if float32_safe(series.values, digits):
+                                df[col] = series.values.astype(np.float32)
+                elif pd.api.types.is_integer_dtype(series):
+                        df[col] = pd.to_numeric(series, downcast='integer')
+                elif pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series):
+                        if len(series) > 0 and series.nunique(dropna=True) / len(series) < maxUniqueRatio:
+                                df[col] = series.astype('category')
+        after = int(df.memory_usage(deep=True).sum())
+        report = {'bytes_before': before, 'bytes_after': after, 'bytes_saved': before - after}
+        return df, report
 
 
 
@@ -104,6 +186,11 @@ def config_path():
         return os.path.join(os.path.dirname(os.path.realpath(__file__)), 'config.csv')
 
 
+def cache_path(fname):
+        """Returns the path to a local cache file (stored next to the config file)."""
+        return os.path.join(os.path.dirname(config_path()), fname)
+
+
 def initiate_config_file(token, vizEngine, exportDir, exportFormat, figureDir):
         """Creates a .csv file hosting the primary project configs """
         if vizEngine is None: vizEngine = 'plotly'
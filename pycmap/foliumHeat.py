@@ -9,14 +9,18 @@ Function: Create a geospatial heatmap of sparse variables within a predefined sp
 import sys
 import os
 sys.path.append(os.path.dirname(__file__))
+import json
 from .common import (
                     normalize,
                     open_HTML,
                     get_figure_dir
                     )
+from .track import simplify_track
 import numpy as np
+import pandas as pd
 import folium
-from folium.plugins import HeatMap, MarkerCluster, Fullscreen, MousePosition
+from folium.map import Layer
+from folium.plugins import HeatMap, FastMarkerCluster, Fullscreen, MousePosition
 import branca
 
 colors = ['#FF8C00', '#0A8A9F', '#808080', '#90EE90', '#FFFFFF', '#5F9EA0', '#FF0000', '#0000FF', '#008000', '#800080', '#FFA500', '#8B0000', '#FFFFE0', '#FFC0CB']
@@ -44,12 +48,55 @@ def addMousePosition(m):
     return m
 
 
+class BulkCircleLayer(Layer):
+    """
+    A layer of circle markers for many points. All points are serialized as a single JSON array and the markers
+    are created on the client side by a JavaScript callback (called once per row), so the size of the html
+    and the time to generate it grow linearly with a small constant.
+    """
+
+    _template = branca.element.Template("""
+        {% macro script(this, kwargs) %}
+            var {{ this.get_name() }} = (function(){
+                var callback = {{ this.callback }};
+                var data = {{ this.data }};
+                var layer = L.featureGroup();
+                for (var i = 0; i < data.length; i++) {
+                    callback(data[i]).addTo(layer);
+                }
+                layer.addTo({{ this._parent.get_name() }});
+                return layer;
+            })();
+        {% endmacro %}
+        """)
+
+    def __init__(self, rows, callback, name=None, overlay=True, control=True, show=True):
+        """
+        :param list rows: list of [lat, lon, ...] rows; the extra items are available to the callback.
+        :param str callback: JavaScript function that takes a row and returns a leaflet layer (e.g. L.circleMarker).
+        """
+        super().__init__(name=name, overlay=overlay, control=control, show=show)
+        self._name = 'BulkCircleLayer'
+        self.data = json.dumps(rows, separators=(',', ':'))
+        self.callback = callback
+
+
+def point_rows(df, *columns):
+    """Returns the rows of [lat, lon, *columns] (coordinates rounded to ~1 m) used by the bulk point layers."""
+    cols = [df['lat'].astype(float).round(5).tolist(), df['lon'].astype(float).round(5).tolist()]
+    cols += [c.tolist() if hasattr(c, 'tolist') else list(c) for c in columns]
+    return [list(r) for r in zip(*cols)]
+
+
 def addMarkers(m, df, variable, unit):
-    normalized = normalize(df[variable])
-    mc = MarkerCluster(name=variable+unit, options={'spiderfyOnMaxZoom':'False', 'disableClusteringAtZoom' : '4'})
-    for i in range(len(df)):
-        folium.CircleMarker(location=[df.lat[i], df.lon[i]], radius=(normalized[i] * 10), tooltip='%s: %f%s <br> date: %s' % (variable, df[variable][i], unit, df['time'][i]), color='darkOrange', fill=True).add_to(mc)
-    mc.add_to(m)
+    normalized = np.asarray(normalize(df[variable]), dtype=float)
+    # the markers and their tooltips are created by the browser from a single array of [lat, lon, radius, value, time] rows
+    rows = point_rows(df, np.round(normalized * 10, 3), df[variable].astype(float), df['time'].astype(str))
+    callback = """function (row) {
+        return L.circleMarker(new L.LatLng(row[0], row[1]), {radius: row[2], color: 'darkOrange', fill: true})
+                .bindTooltip(%s + row[3].toFixed(6) + %s + ' <br> date: ' + row[4]);
+    }""" % (json.dumps(variable + ': '), json.dumps(unit))
+    FastMarkerCluster(rows, callback=callback, name=variable+unit, options={'spiderfyOnMaxZoom':'False', 'disableClusteringAtZoom' : '4'}).add_to(m)
     return m
 
 
@@ -65,10 +112,10 @@ def addFullScreen(m):
 
 
 def addTrackMarkers(m, df, cruise):
-    mc = MarkerCluster(name=cruise, options={'spiderfyOnMaxZoom':'False', 'disableClusteringAtZoom' : '4'})
-    for i in range(len(df)):
-        folium.CircleMarker(location=[df.lat[i], df.lon[i]], radius=(2), color='darkOrange', fill=True).add_to(mc)
-    mc.add_to(m)
+    callback = """function (row) {
+        return L.circleMarker(new L.LatLng(row[0], row[1]), {radius: 2, color: 'darkOrange', fill: true});
+    }"""
+    FastMarkerCluster(point_rows(df), callback=callback, name=cruise, options={'spiderfyOnMaxZoom':'False', 'disableClusteringAtZoom' : '4'}).add_to(m)
     return m
 
 def add_cruise_legend(m, cruises, legendColors):
@@ -135,18 +182,25 @@ def folium_map(df, table, variable, unit):
     return
 
 
-def folium_cruise_track(df, stations=None):
+def folium_cruise_track(df, stations=None, tolerance=None):
+    """
+    Plots cruise tracks on a folium map. 
+    If `tolerance` [degrees] is set, each track is simplified (Douglas-Peucker) before plotting; see `track.simplify_track`.
+    """
     df['lon'] = np.where(df['lon'] > 0, df['lon']-360, df['lon'])
-    m = folium.Map([df.lat.mean(), df.lon.mean()], tiles=None, zoom_start=3, control_scale=True, prefer_canvas=True)
     cruises = df['cruise'].unique()
+    if tolerance is not None:
+        df = pd.concat([simplify_track(df[df['cruise'] == cru], tolerance) for cru in cruises], ignore_index=True)
+    m = folium.Map([df.lat.mean(), df.lon.mean()], tiles=None, zoom_start=3, control_scale=True, prefer_canvas=True)
     m.get_root().title = 'Cruise: ' + ', '.join(cruises)
     m = addLayers(m)
-    legendColors = []
-    for i in range(len(df)):
-        ind = list(cruises).index(df.cruise[i]) % len(colors)
-        if len(legendColors) == 0: legendColors.append(colors[ind])
-        if legendColors[-1] != colors[ind]: legendColors.append(colors[ind])
-        folium.CircleMarker(location=[df.lat[i], df.lon[i]], radius=(2), color=colors[ind], fill=True).add_to(m)
+    ind = pd.Categorical(df['cruise'], categories=cruises).codes % len(colors)
+    # legend colors in order of appearance along the rows (consecutive repeats removed)
+    legendColors = [colors[k] for k in ind[np.r_[True, ind[1:] != ind[:-1]]]] if len(ind) > 0 else []
+    callback = """function (row) {
+        return L.circleMarker(new L.LatLng(row[0], row[1]), {radius: 2, color: %s[row[2]], fill: true});
+    }""" % json.dumps(colors)
+    BulkCircleLayer(point_rows(df, ind), callback, control=False).add_to(m)
 
     if not stations is None:
         for i in range(len(stations)):
@@ -42,11 +42,25 @@ class Hist(BaseGraph):
         self.variable = variable
         self.bins = bins
         self.pdf = pdf
+        # precomputed bin counts (sketch.StreamingHistogram), e.g. accumulated over chunks of data; if set, `data` is not used
+        self.histogram = None
 
     def render(self):
         """Display the graph object."""
         super().render()
 
+    def bin_counts(self):
+        """Returns the histogram values (counts, or densities if `pdf` is True) and the bin edges."""
+        if self.histogram is not None:
+            hist = self.histogram.density() if self.pdf else self.histogram.counts
+            return hist, self.histogram.edges
+        y = self.data[self.variable]
+        try:    
+            y = y[~np.isnan(y)]     
+        except:
+            pass    
+        return np.histogram(y, density=self.pdf, bins=self.bins)
+
     def graph_obj(self):
         """Creates an instance from one of the derived classes of Hist."""
         vizEngine = get_vizEngine().lower().strip()
@@ -102,12 +116,7 @@ class HistBokeh(Hist):
     def render(self):
         """Display the graph object."""
         super().render()
-        y = self.data[self.variable]
-        try:    
-            y = y[~np.isnan(y)]     
-        except:
-            pass    
-        hist, edges = np.histogram(y, density=self.pdf, bins=self.bins)
+        hist, edges = self.bin_counts()
         p = figure(
                     tools=self.tools, 
                     toolbar_location=self.toolbarLocation, 
@@ -162,15 +171,16 @@ class HistPlotly(Hist):
         """Display the graph object."""
         super().render()
 
-        histnorm = 'probability density' if self.pdf else ''
+        # the data are binned here; only the bin counts are sent to plotly
+        hist, edges = self.bin_counts()
         data = [
-                go.Histogram(
-                             x=self.data[self.variable],
-                             nbinsx=self.bins,
-                             histnorm=histnorm,
-                             name=self.legend,
-                             opacity=self.fillAlpha
-                            )
+                go.Bar(
+                       x=(edges[:-1] + edges[1:]) / 2,
+                       y=hist,
+                       width=np.diff(edges),
+                       name=self.legend,
+                       opacity=self.fillAlpha
+                      )
                ]
 
         layout = go.Layout(
@@ -17,6 +17,7 @@ from .common import (
                      inline
                     )
 from .colorMaps import getPalette
+from .pyramid import level_of_detail
 from datetime import datetime
 import warnings
 import numpy as np
@@ -28,7 +29,10 @@ from bokeh.models import (
                           LinearColorMapper, 
                           BasicTicker, 
                           ColorBar, 
-                          DatetimeTickFormatter
+                          DatetimeTickFormatter,
+                          ColumnDataSource,
+                          Slider,
+                          CustomJS
                           )
 import plotly
 import plotly.graph_objs as go
@@ -45,7 +49,8 @@ class Map(BaseGraph):
                 data, 
                 variable,
                 levels=0,
-                surface3D=False
+                surface3D=False,
+                limitsKey=None
                 ):
 
         """
@@ -53,14 +58,20 @@ class Map(BaseGraph):
         :param str variable: variable name.
         :param int levels: number of contour levels. If zero, heatmap is created. If greater than zero, contour lines are superimposed on the heatmap. Currently, contour graphs are created by plotly library.
         :param bool surface3D: if true, creates a 3D surface plot (only available through plotly library).
+        :param tuple limitsKey: cache key of the data limits (e.g. table, variable, and the space-time box); see `common.get_data_limits`.
         """
         super().__init__()
         self.data = data
         self.variable = variable
-        self.vmin, self.vmax = get_data_limits(self.data[self.variable])
+        self.limitsKey = limitsKey
+        self.vmin, self.vmax = get_data_limits(self.data[self.variable], key=limitsKey)
         self.cmap = getPalette(self.variable)
         self.levels = int(np.abs(levels))       
         self.surface3D = surface3D 
+        # if True, layers larger than the figure (width x height pixels) are block-averaged before rendering; self.data is kept at full resolution
+        self.lod = True
+        # if True, all layers (times/depths) are displayed in a single figure with a layer slider, rather than one figure per layer
+        self.slider = False
 
 
     def render(self):
@@ -77,9 +88,9 @@ class Map(BaseGraph):
             warnings.warn('Please switch the vizEngine to "plotly" to create 3D surface plots.', UserWarning)
 
         if vizEngine == 'bokeh':
-            obj = MapBokeh(self.data, self.variable, self.levels, self.surface3D)
+            obj = MapBokeh(self.data, self.variable, self.levels, self.surface3D, limitsKey=self.limitsKey)
         elif vizEngine == 'plotly':
-            obj = MapPlotly(self.data, self.variable, self.levels, self.surface3D)
+            obj = MapPlotly(self.data, self.variable, self.levels, self.surface3D, limitsKey=self.limitsKey)
         return obj         
 
 
@@ -135,7 +146,8 @@ class MapBokeh(Map):
                 variable, 
                 levels,
                 surface3D,
-                toolbarLocation='right'
+                toolbarLocation='right',
+                limitsKey=None
                 ):
 
         """
@@ -145,59 +157,83 @@ class MapBokeh(Map):
         :param str toolbarLocation: location of graph toolbar.
         """
 
-        super().__init__(data, variable, levels, surface3D)
+        super().__init__(data, variable, levels, surface3D, limitsKey)
         self.toolbarLocation = toolbarLocation
         self.tools = get_bokeh_tools()
 
 
+    def layer_figure(self, source, lat, lon, title):
+        """Creates a map figure that displays the image held by `source` (a ColumnDataSource with an `image` column)."""
+        p = figure(
+                tools=self.tools, 
+                toolbar_location=self.toolbarLocation, 
+                plot_width=self.width, 
+                plot_height=self.height,
+                x_range=(np.min(lon), np.max(lon)),
+                y_range=(np.min(lat), np.max(lat)),
+                title=title
+                )
+        p.xaxis.axis_label = self.xlabel
+        p.yaxis.axis_label = self.ylabel
+        colorMapper = LinearColorMapper(palette=self.cmap, low=self.vmin, high=self.vmax)
+        p.image(
+                image='image', 
+                source=source,
+                color_mapper=colorMapper, 
+                x=np.min(lon), 
+                y=np.min(lat), 
+                dw=np.max(lon)-np.min(lon), 
+                dh=np.max(lat)-np.min(lat)
+                )
+
+        p.add_tools(HoverTool(
+                            tooltips=[
+                                ('longitude', '$x'),
+                                ('latitude', '$y'),
+                                (self.variable + self.unit, '@image'),
+                            ],
+                            mode='mouse'
+                            )
+                    )
+
+        colorBar = ColorBar(
+                            color_mapper=colorMapper, 
+                            ticker=BasicTicker(),
+                            label_standoff=12, 
+                            border_line_color=None, 
+                            location=(0,0)
+                            )
+
+        p.add_layout(colorBar, 'right')
+        return p
+
+
     def render(self):
         """Display the graph object."""
         super().render()
         layers, titles, lat, lon = self.make_layers()
-        plots = []
-        for i in range(len(layers)):
-            p = figure(
-                    tools=self.tools, 
-                    toolbar_location=self.toolbarLocation, 
-                    plot_width=self.width, 
-                    plot_height=self.height,
-                    x_range=(np.min(lon), np.max(lon)),
-                    y_range=(np.min(lat), np.max(lat)),
-                    title=titles[i]
-                    )
-            p.xaxis.axis_label = self.xlabel
-            p.yaxis.axis_label = self.ylabel
-            colorMapper = LinearColorMapper(palette=self.cmap, low=self.vmin, high=self.vmax)
-            p.image(
-                    image=[layers[i]], 
-                    color_mapper=colorMapper, 
-                    x=np.min(lon), 
-                    y=np.min(lat), 
-                    dw=np.max(lon)-np.min(lon), 
-                    dh=np.max(lat)-np.min(lat)
-                    )
-
-            p.add_tools(HoverTool(
-                                tooltips=[
-                                    ('longitude', '$x'),
-                                    ('latitude', '$y'),
-                                    (self.variable + self.unit, '@image'),
-                                ],
-                                mode='mouse'
-                                )
-                        )
-
-            colorBar = ColorBar(
-                                color_mapper=colorMapper, 
-                                ticker=BasicTicker(),
-                                label_standoff=12, 
-                                border_line_color=None, 
-                                location=(0,0)
-                                )
-
-            p.add_layout(colorBar, 'right')
-            plots.append(p)
-        
+        # the image extent is taken from the full resolution coordinates
+        if self.lod: layers, _, _ = level_of_detail(layers, lat, lon, self.height, self.width)
+        if self.slider and len(layers) > 1:
+            # a single figure; the slider swaps the displayed layer on the client side
+            source = ColumnDataSource(data={'image': [layers[0]]})
+            allLayers = ColumnDataSource(data={'image': layers, 'title': titles})
+            p = self.layer_figure(source, lat, lon, titles[0])
+            layerSlider = Slider(start=0, end=len(layers)-1, value=0, step=1, title='layer')
+            layerSlider.js_on_change('value', CustomJS(
+                                                      args=dict(source=source, allLayers=allLayers, title=p.title), 
+                                                      code="""
+                                                      source.data['image'] = [allLayers.data['image'][cb_obj.value]];
+                                                      title.text = allLayers.data['title'][cb_obj.value];
+                                                      source.change.emit();
+                                                      """
+                                                      ))
+            plots = [layerSlider, p]
+        else:
+            plots = [
+                    self.layer_figure(ColumnDataSource(data={'image': [layers[i]]}), lat, lon, titles[i])
+                    for i in range(len(layers))
+                    ]
         
         if not inline(): output_file(get_figure_dir() + self.variable + ".html", title=self.variable)        
         show(column(plots))    
@@ -219,7 +255,8 @@ class MapPlotly(Map):
                 data, 
                 variable,
                 levels,
-                surface3D
+                surface3D,
+                limitsKey=None
                 ):
 
         """
@@ -228,21 +265,22 @@ class MapPlotly(Map):
         :param int levels: number of contour levels. if zero, heatmap is created.
         :param bool surface3D: if true, creates a 3D surface plot (only available through plotly library).
         """
-        super().__init__(data, variable, levels, surface3D)
+        super().__init__(data, variable, levels, surface3D, limitsKey)
 
 
     def render(self):
         """Display the graph object."""
         super().render()
         layers, titles, latVect, lonVect = self.make_layers()
+        if self.lod: layers, latVect, lonVect = level_of_detail(layers, latVect, lonVect, self.height, self.width)
         LON, LAT = np.meshgrid(lonVect, latVect)
         lon = LON.flatten()
         lat = LAT.flatten()
+        frames, steps = [], []
         for i in range(len(layers)):
             vals = layers[i].flatten()
-            hovertext = []
-            for k in range(len(vals)):
-                hovertext.append('lon: {:.2f}<br>lat: {:.2f}<br>{}: {:.1e}'.format(lon[k], lat[k], self.variable + self.unit,vals[k]))
+            # hover labels are formatted by plotly on the client side; no per-cell strings are created (or embedded in the html)
+            hovertemplate = 'lon: %{x:.2f}<br>lat: %{y:.2f}<br>' + self.variable + self.unit + ': %{z:.1e}<extra></extra>'
             if self.levels == 0:
                 data = [
                         go.Heatmap(
@@ -252,8 +290,7 @@ class MapPlotly(Map):
                                     colorscale=self.cmap,
                                     zmin=self.vmin,
                                     zmax=self.vmax,
-                                    hoverinfo='text',
-                                    text=hovertext            
+                                    hovertemplate=hovertemplate
                                     )
                         ]
             elif self.levels > 0:
@@ -263,8 +300,7 @@ class MapPlotly(Map):
                                     y=lat,
                                     z=vals,
                                     colorscale=self.cmap,
-                                    hoverinfo='text',
-                                    text=hovertext,             
+                                    hovertemplate=hovertemplate,
                                     connectgaps=False,
                                     contours=dict(
                                         coloring='heatmap',
@@ -314,4 +350,21 @@ class MapPlotly(Map):
                                   )  
 
 
-            self._save_plotly_(go, data, layout)                     
+            if self.slider and len(layers) > 1:
+                # single figure: each frame holds only the layer values; the axes, colorscale and hover are shared
+                frames.append(go.Frame(
+                                      data=[type(data[0])(z=layers[i] if self.surface3D else vals)], 
+                                      layout={'title': titles[i]}, 
+                                      name=str(i)
+                                      ))
+                steps.append(dict(
+                                 method='animate', 
+                                 label=str(i+1), 
+                                 args=[[str(i)], {'mode': 'immediate', 'frame': {'duration': 0, 'redraw': True}, 'transition': {'duration': 0}}]
+                                 ))
+                if i == 0: firstData, firstLayout = data, layout
+                continue
+            self._save_plotly_(go, data, layout)
+        if len(frames) > 0:
+            firstLayout.update(sliders=[{'active': 0, 'steps': steps, 'currentvalue': {'prefix': 'layer: '}}])
+            self._save_plotly_(go, firstData, firstLayout, frames)                     
@@ -53,7 +53,8 @@ class Match(object):
         timeTolerance,
         latTolerance,
         lonTolerance,
-        depthTolerance
+        depthTolerance,
+        api=None
         ):
 
         """
@@ -74,6 +75,7 @@ class Match(object):
         :param list latTolerance: float list of spatial tolerance values in meridional direction [deg] between pairs of source and target data sets. If only one value is given, that would be applied to all target data sets.
         :param list lonTolerance: float list of spatial tolerance values in zonal direction [deg] between pairs of source and target data sets. If only one value is given, that would be applied to all target data sets.
         :param list depthTolerance: float list of spatial tolerance values in vertical direction [m] between pairs of source and target data sets. If only one value is given, that would be applied to all target data sets.
+        :param API api: client instance used to submit the queries. If None, a new client is created.
         """
 
         if isinstance(sourceTable, list): 
@@ -108,6 +110,7 @@ class Match(object):
         self.latTolerance = latTolerance
         self.lonTolerance = lonTolerance
         self.depthTolerance = depthTolerance
+        self.api = api or API()
 
         self.validateInit()
         return
@@ -174,8 +177,8 @@ class Match(object):
         return msg
 
 
-    @staticmethod
     def _atomic_match(
+                     self,
                      spName, sourceTable, sourceVar, targetTable, targetVar, 
                      dt1, dt2, lat1, lat2, lon1, lon2, depth1, depth2, 
                      temporalTolerance, latTolerance, lonTolerance, depthTolerance
@@ -192,7 +195,7 @@ class Match(object):
                 temporalTolerance, latTolerance, lonTolerance, depthTolerance]
         args = [str(arg) for arg in args]        
         query = "EXEC %s '%s', '%s','%s', '%s', '%s', '%s', '%s', '%s', '%s', '%s', '%s', '%s', '%s', '%s', '%s', '%s'" % tuple(args)
-        return API().query(query)  
+        return self.api.query(query)  
 
 
 
@@ -0,0 +1,131 @@
+"""
+Function: Progress and metrics sinks for long running (multi-threaded) procedures.
+"""
+
+
+import sys
+import json
+import time
+import threading
+import numpy as np
+
+
+
+class ProgressSink(object):
+    """
+    Base class of progress/metrics sinks. Collects the number of completed rows, the number of submitted queries,
+    their latency histogram, retries, empty results, and errors. Thread-safe.
+    Derived classes may override `update` to display the progress; it is called at most once every `refreshInterval` seconds.
+    """
+
+    # upper edges of the latency histogram buckets [seconds]
+    LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, np.inf)
+
+    def __init__(self, refreshInterval=0.5, label=''):
+        """
+        :param float refreshInterval: minimum time between two consecutive progress updates [seconds].
+        :param str label: name of the procedure being tracked.
+        """
+        self.refreshInterval = refreshInterval
+        self.label = label
+        self.total = 0
+        self.rows = 0
+        self.queries = 0
+        self.retries = 0
+        self.empty = 0
+        self.errors = 0
+        self.latencyCounts = np.zeros(len(self.LATENCY_BUCKETS), dtype=int)
+        self.latencySum = 0.
+        self._started = None
+        self._finished = None
+        self._lastUpdate = 0.
+        self._lock = threading.Lock()
+
+
+    def start(self, total):
+        """Marks the start of the run with `total` rows to be processed."""
+        with self._lock:
+            self.total = total
+            self._started = time.monotonic()
+
+
+    def record_query(self, latency, retries=0, empty=False, error=False):
+        """Records the outcome of a single query."""
+        with self._lock:
+            self.queries += 1
+            self.retries += retries
+            self.empty += int(empty and not error)
+            self.errors += int(error)
+            self.latencySum += latency
+            self.latencyCounts[np.searchsorted(self.LATENCY_BUCKETS, latency)] += 1
+
+
+    def record_rows(self, rows=1):
+        """Records completed rows and refreshes the progress display if due."""
+        with self._lock:
+            self.rows += rows
+            now = time.monotonic()
+            due = now - self._lastUpdate >= self.refreshInterval
+            if due: self._lastUpdate = now
+        if due: self.update()
+
+
+    def finish(self):
+        """Marks the end of the run and refreshes the progress display one last time."""
+        with self._lock:
+            self._finished = time.monotonic()
+        self.update()
+
+
+    def latency_percentile(self, q):
+        """Returns the (bucket upper edge) estimate of the q-th latency percentile [seconds]."""
+        if self.queries < 1: return None
+        ind = np.searchsorted(np.cumsum(self.latencyCounts), q / 100. * self.queries)
+        return float(self.LATENCY_BUCKETS[min(ind, len(self.LATENCY_BUCKETS)-1)])
+
+
+    def report(self):
+        """Returns a dictionary summarizing the run."""
+        with self._lock:
+            end = self._finished or time.monotonic()
+            elapsed = end - self._started if self._started is not None else 0.
+            return {
+                   'label': self.label,
+                   'total_rows': self.total,
+                   'completed_rows': self.rows,
+                   'elapsed_seconds': elapsed,
+                   'rows_per_second': self.rows / elapsed if elapsed > 0 else None,
+                   'queries': self.queries,
+                   'queries_per_second': self.queries / elapsed if elapsed > 0 else None,
+                   'mean_latency_seconds': self.latencySum / self.queries if self.queries > 0 else None,
+                   'p50_latency_seconds': self.latency_percentile(50),
+                   'p95_latency_seconds': self.latency_percentile(95),
+                   'latency_histogram': {str(b): int(c) for b, c in zip(self.LATENCY_BUCKETS, self.latencyCounts)},
+                   'retries': self.retries,
+                   'empty_results': self.empty,
+                   'errors': self.errors
+                   }
+
+
+    def save(self, path):
+        """Stores the run report as a json file."""
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+
+
+    def update(self):
+        """Displays the progress; the base class is silent."""
+        pass
+
+
+
+
+class ConsoleProgress(ProgressSink):
+    """Displays a single, periodically refreshed progress line on the console (stdout)."""
+
+    def update(self):
+        rep = self.report()
+        qps = rep['queries_per_second'] or 0
+        line = '\r%s %d / %d rows, %.1f queries/s' % (self.label, rep['completed_rows'], rep['total_rows'], qps)
+        if rep['retries'] > 0 or rep['errors'] > 0: line += ', %d retries, %d errors' % (rep['retries'], rep['errors'])
+        print(line + ' ' * 20, end='', flush=True, file=sys.stdout)
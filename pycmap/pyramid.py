@@ -0,0 +1,81 @@
+"""
+Function: Level-of-detail (multi-resolution) representation of gridded layers, used to decimate large maps and sections before rendering.
+"""
+
+
+import numpy as np
+
+
+
+def block_sum(array, factors):
+    """
+    Sums a 2D array over non-overlapping blocks of size `factors` (rows, columns), ignoring NaNs.
+    The array is padded (with NaN) to a multiple of the block size.
+    Returns the block sums and the number of valid (non-NaN) entries in each block.
+    """
+    fy, fx = factors
+    ny, nx = array.shape
+    padded = np.full((-(-ny // fy) * fy, -(-nx // fx) * fx), np.nan)
+    padded[:ny, :nx] = array
+    blocks = padded.reshape(padded.shape[0] // fy, fy, padded.shape[1] // fx, fx)
+    valid = ~np.isnan(blocks)
+    return np.where(valid, blocks, 0).sum(axis=(1, 3)), valid.sum(axis=(1, 3))
+
+
+def coarsen_axis(values, factor):
+    """Averages a coordinate vector over non-overlapping blocks of length `factor` (the last block may be shorter)."""
+    values = np.asarray(values, dtype=float)
+    if factor <= 1: return values
+    return np.array([np.nanmean(values[i:i+factor]) for i in range(0, len(values), factor)])
+
+
+
+class Pyramid(object):
+    """
+    Level-of-detail pyramid of a 2D gridded layer. Level (ky, kx) is the layer block-averaged (NaN-aware)
+    by 2**ky along rows and 2**kx along columns. Levels are built on demand and cached.
+    The original layer is kept untouched (level (0, 0)) so that exports are made at full resolution.
+    """
+
+    def __init__(self, layer, y, x):
+        """
+        :param array layer: 2D array of shape (len(y), len(x)).
+        :param array y: row coordinates (e.g. latitude or depth).
+        :param array x: column coordinates (e.g. longitude or latitude).
+        """
+        self.layer = np.asarray(layer, dtype=float)
+        self.y = np.asarray(y)
+        self.x = np.asarray(x)
+        self._levels = {(0, 0): (self.layer, self.y, self.x)}
+
+
+    def level(self, ky, kx):
+        """Returns the layer and its row/column coordinates at level (ky, kx)."""
+        if (ky, kx) not in self._levels:
+            total, count = block_sum(self.layer, (2**ky, 2**kx))
+            with np.errstate(invalid='ignore', divide='ignore'):
+                layer = total / count
+            layer[count == 0] = np.nan
+            self._levels[(ky, kx)] = (layer, coarsen_axis(self.y, 2**ky), coarsen_axis(self.x, 2**kx))
+        return self._levels[(ky, kx)]
+
+
+    def fit(self, maxRows, maxCols):
+        """Returns the finest level whose shape does not exceed maxRows x maxCols (e.g. the figure size in pixels)."""
+        ky = int(np.ceil(np.log2(self.layer.shape[0] / maxRows))) if self.layer.shape[0] > maxRows else 0
+        kx = int(np.ceil(np.log2(self.layer.shape[1] / maxCols))) if self.layer.shape[1] > maxCols else 0
+        return self.level(ky, kx)
+
+
+
+def level_of_detail(layers, y, x, maxRows, maxCols):
+    """
+    Decimates a list of 2D layers (sharing the same coordinates) to fit within a pixel budget of maxRows x maxCols.
+    Returns the decimated layers and their row/column coordinates. Layers that already fit are returned unchanged.
+    """
+    if len(layers) < 1: return layers, y, x
+    decimated = []
+    for layer in layers:
+        layer, ly, lx = Pyramid(layer, y, x).fit(maxRows, maxCols)
+        decimated.append(layer)
+    return decimated, ly, lx
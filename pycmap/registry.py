@@ -0,0 +1,169 @@
+"""
+Function: Local registries of table information, cached in memory and persisted across sessions.
+"""
+
+
+import os
+import json
+import time
+import threading
+import pandas as pd
+from .common import cache_path
+
+
+
+class Registry(object):
+    """
+    A thread-safe key/value store with a freshness policy, persisted on local disk as a json file.
+    Each entry expires `ttl` seconds after it has been stored; `freshness` may override the ttl per key.
+    """
+
+    def __init__(self, path, ttl=7*24*3600, freshness=None):
+        """
+        :param str path: path to the json file where the registry is persisted. If None, the registry is kept in memory only.
+        :param float ttl: default time-to-live of the entries [seconds].
+        :param dict freshness: per key time-to-live overrides [seconds].
+        """
+        self.path = path
+        self.ttl = ttl
+        self.freshness = freshness or {}
+        self._entries = None
+        self._lock = threading.RLock()
+
+
+    def _load(self):
+        if self._entries is not None: return
+        self._entries = {}
+        if self.path is None or not os.path.isfile(self.path): return
+        try:
+            with open(self.path) as f:
+                self._entries = json.load(f)
+        except (ValueError, OSError):
+            self._entries = {}
+
+
+    def _save(self):
+        if self.path is None: return
+        try:
+            tmp = self.path + '.%d.tmp' % os.getpid()
+            with open(tmp, 'w') as f:
+                json.dump(self._entries, f)
+            os.replace(tmp, self.path)
+        except OSError:
+            pass
+
+
+    def get(self, key):
+        """Returns the value stored under key, or None if it does not exist or is stale."""
+        with self._lock:
+            self._load()
+            entry = self._entries.get(key)
+            if entry is None: return None
+            if time.time() - entry['stored'] > self.freshness.get(key, self.ttl): return None
+            return entry['value']
+
+
+    def set(self, key, value):
+        """Stores a value under key and persists the registry."""
+        with self._lock:
+            self._load()
+            self._entries[key] = {'stored': time.time(), 'value': value}
+            self._save()
+
+
+    def invalidate(self, key=None):
+        """Removes an entry (or all entries if key is None) from the registry."""
+        with self._lock:
+            self._load()
+            if key is None:
+                self._entries = {}
+            else:
+                self._entries.pop(key, None)
+            self._save()
+
+
+
+
+class SchemaRegistry(Registry):
+    """
+    Column names and data types of the CMAP tables.
+    Table schemas rarely change, so they are fetched once and reused across sessions.
+    """
+
+    def schema(self, api, table, servers=['rainier']):
+        """
+        Returns the list of [column name, data type] pairs of a table, in table order.
+        Returns an empty list if the table does not exist.
+        """
+        cols = self.get(table)
+        if cols is not None: return cols
+        df = api.query(
+                      f"SELECT COLUMN_NAME, DATA_TYPE FROM INFORMATION_SCHEMA.COLUMNS WHERE TABLE_NAME='{table}' ORDER BY ORDINAL_POSITION",
+                      servers
+                      )
+        if len(df) > 0:
+            cols = [[str(c), str(t)] for c, t in zip(df['COLUMN_NAME'], df['DATA_TYPE'])]
+        else:
+            df = api.query(f"EXEC uspColumns '{table}'", servers)
+            cols = [[str(c), None] for c in df['Columns']] if 'Columns' in df.columns else []
+        if len(cols) > 0: self.set(table, cols)
+        return cols
+
+
+    def columns(self, api, table, servers=['rainier']):
+        """Returns the list of column names of a table."""
+        return [c for c, _ in self.schema(api, table, servers)]
+
+
+
+
+class CoverageRegistry(Registry):
+    """
+    Space-time coverage (time range and lat/lon/depth extents) of the CMAP tables, taken from the catalog statistics.
+    The coverage of datasets that are regularly updated (e.g. near-real-time products) changes over time, 
+    so the entries expire after one day by default. Use `freshness` to set a different time-to-live per table.
+    """
+
+    FIELDS = ['startTime', 'endTime', 'lat1', 'lat2', 'lon1', 'lon2', 'depth1', 'depth2']
+
+    def coverage(self, api, table, servers=['rainier']):
+        """
+        Returns a dictionary holding the table's coverage (see `FIELDS`). Missing values are None.
+        The full-table MIN/MAX scan of the time field is used only if the catalog has no time statistics.
+        """
+        cov = self.get(table)
+        if cov is not None: return cov
+        df = api.query(
+                      f"""
+                      SELECT 
+                      JSON_VALUE(JSON_stats,'$.time.min') AS startTime,
+                      JSON_VALUE(JSON_stats,'$.time.max') AS endTime,
+                      CAST(JSON_VALUE(JSON_stats,'$.lat.min') AS float) AS lat1,
+                      CAST(JSON_VALUE(JSON_stats,'$.lat.max') AS float) AS lat2,
+                      CAST(JSON_VALUE(JSON_stats,'$.lon.min') AS float) AS lon1,
+                      CAST(JSON_VALUE(JSON_stats,'$.lon.max') AS float) AS lon2,
+                      CAST(JSON_VALUE(JSON_stats,'$.depth.min') AS float) AS depth1,
+                      CAST(JSON_VALUE(JSON_stats,'$.depth.max') AS float) AS depth2
+                      FROM tblDataset_Stats WHERE Dataset_ID=(SELECT TOP 1 Dataset_ID FROM tblVariables WHERE Table_Name='{table}')
+                      """,
+                      servers
+                      )
+        cov = {f: None for f in self.FIELDS}
+        if len(df) > 0:
+            row = df.iloc[0]
+            for f in self.FIELDS:
+                if f in df.columns and pd.notna(row[f]): cov[f] = row[f] if isinstance(row[f], str) else float(row[f])
+        if cov['startTime'] is None and 'time' in SCHEMA.columns(api, table, servers):
+            df = api.query(f"SELECT MIN([time]) startTime, MAX([time]) endTime FROM {table}", servers)
+            if len(df) > 0:
+                cov['startTime'] = str(df.loc[0, 'startTime'])
+                cov['endTime'] = str(df.loc[0, 'endTime'])
+        if any(v is not None for v in cov.values()): self.set(table, cov)
+        return cov
+
+
+
+
+# shared by all client instances
+SCHEMA = SchemaRegistry(cache_path('schema.json'))
+COVERAGE = CoverageRegistry(cache_path('coverage.json'), ttl=24*3600)
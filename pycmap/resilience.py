@@ -0,0 +1,145 @@
+"""
+Function: Retry policies and circuit breakers for RESTful requests.
+"""
+
+
+import time
+import random
+import threading
+
+
+
+class RequestError(Exception):
+    """
+    Represents a failed request attempt.
+    error.error holds a dictionary describing the failure (code, message, and status_code, if any).
+    error.retryable is True if the attempt may succeed if retried (transient failure).
+    """
+
+    def __init__(self, code, message, status_code=None, retryable=True):
+        super().__init__(message)
+        self.error = {'code': code, 'message': message, 'status_code': status_code}
+        self.retryable = retryable
+
+
+
+class RetryPolicy(object):
+    """
+    Retry policy of idempotent (GET) requests.
+    The wait time before each retry grows exponentially and is randomized (full jitter)
+    so that concurrent clients do not retry in lockstep.
+    """
+
+    def __init__(
+                self,
+                maxRetries=3,
+                baseDelay=0.5,
+                maxDelay=10,
+                retryStatus=(429, 500, 502, 503, 504),
+                circuitWait=60
+                ):
+        """
+        :param int maxRetries: maximum number of retries after the first attempt.
+        :param float baseDelay: base backoff delay [seconds].
+        :param float maxDelay: upper bound of backoff delay [seconds].
+        :param tuple retryStatus: http status codes that are considered transient.
+        :param float circuitWait: maximum time a request waits for the open circuit of its server to let requests through 
+            again, before it fails [seconds].
+        """
+        self.maxRetries = maxRetries
+        self.baseDelay = baseDelay
+        self.maxDelay = maxDelay
+        self.retryStatus = retryStatus
+        self.circuitWait = circuitWait
+
+
+    def delay(self, attempt):
+        """Returns the (randomized) wait time before the retry number `attempt` (zero-based)."""
+        return random.uniform(0, min(self.maxDelay, self.baseDelay * 2 ** attempt))
+
+
+
+NO_RETRY = RetryPolicy(maxRetries=0, circuitWait=0)
+
+
+
+class CircuitBreaker(object):
+    """
+    Tracks consecutive failures of a single server.
+    Once `failureThreshold` consecutive failures are recorded, the circuit opens and requests to the
+    server are rejected for `resetTimeout` seconds. After that, a single trial request is let through (half-open);
+    the circuit closes if it succeeds and opens again otherwise.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half-open'
+
+    # polling interval of the requests waiting for the outcome of a half-open trial request [seconds]
+    TRIAL_POLL = 0.25
+
+    def __init__(self, failureThreshold=5, resetTimeout=30):
+        """
+        :param int failureThreshold: number of consecutive failures that opens the circuit.
+        :param float resetTimeout: time the circuit stays open before a trial request is allowed [seconds].
+        """
+        self.failureThreshold = failureThreshold
+        self.resetTimeout = resetTimeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._openedAt = 0
+        self._lock = threading.Lock()
+
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._openedAt >= self.resetTimeout:
+                return self.HALF_OPEN
+            return self._state
+
+
+    def allow(self):
+        """Returns True if a request may be sent to the server."""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN and time.monotonic() - self._openedAt >= self.resetTimeout:
+                self._state = self.HALF_OPEN
+                return True
+            return False
+
+
+    def retry_after(self):
+        """Returns the time until the circuit may let a request through [seconds]; zero if the circuit is closed."""
+        with self._lock:
+            if self._state == self.CLOSED: return 0.
+            if self._state == self.HALF_OPEN: return self.TRIAL_POLL
+            return max(0., self.resetTimeout - (time.monotonic() - self._openedAt))
+
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failureThreshold:
+                self._state = self.OPEN
+                self._openedAt = time.monotonic()
+
+
+
+_breakers = {}
+_breakersLock = threading.Lock()
+
+def get_breaker(server, baseURL=None):
+    """
+    Returns the circuit breaker associated with a server behind an API endpoint (shared by all client instances).
+    Servers of different endpoints (`baseURL`) have separate breakers.
+    """
+    key = (baseURL, server)
+    with _breakersLock:
+        if key not in _breakers: _breakers[key] = CircuitBreaker()
+        return _breakers[key]
@@ -7,12 +7,23 @@ Function: Encapsulates RESTful API logic.
 """
 
 
-import sys, requests, random
-from requests.exceptions import HTTPError
+import sys, requests
+import time
+import threading
+import concurrent.futures
 from urllib.parse import urlencode
 import numpy as np
 import pandas as pd
 from io import StringIO
+from collections import OrderedDict
+from .resilience import RequestError, RetryPolicy, get_breaker
+from .balancer import BALANCER
+from .singleFlight import SingleFlight
+from .registry import SCHEMA, COVERAGE
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None    
 from .common import (
     halt,
     print_tqdm,
@@ -22,11 +33,16 @@ from .common import (
     save_config, 
     catalog_sql,
     inline,
+    compact_dataframe,
     MAX_ROWS
 )
 
 
 
+ARROW_STREAM_MEDIA_TYPE = 'application/vnd.apache.arrow.stream'
+
+
+
 class APIError(Exception):
     '''
     Represents API related error.
@@ -65,6 +81,28 @@ class _REST(object):
     Handles RESTful requests to the Simons CMAP API.
     """
 
+    # request the Arrow IPC stream format when pyarrow is installed
+    ACCEPT_ARROW = True
+
+    # (connect, read) timeouts [seconds] of a single request attempt
+    REQUEST_TIMEOUT = (10, 900)
+
+    # runs the hedged (duplicate) requests, shared by all client instances
+    _hedgeExecutor = concurrent.futures.ThreadPoolExecutor(max_workers=32)
+
+    # identical queries in flight at the same time (from any client instance) are sent only once
+    COALESCE = True
+    _inFlight = SingleFlight()
+
+    # variable metadata shared by all client instances, keyed by (baseURL, table, variable); the least recently used entries 
+    # are evicted beyond METADATA_CACHE_SIZE entries, and entries expire after METADATA_TTL seconds
+    METADATA_CACHE_SIZE = 1024
+    METADATA_TTL = 3600
+    _metadataCache = OrderedDict()
+    _metadataLock = threading.Lock()
+    METADATA_WORKERS = 8
+    TRAJECTORY_WORKERS = 8
+
     def __init__(self,
                  token=None,
                  baseURL=None,
@@ -73,6 +111,9 @@ class _REST(object):
                  exportDir=None,
                  exportFormat=None,
                  figureDir=None,
+                 memoryProfile=False,
+                 retryPolicy=None,
+                 hedge=False
                  ):
         """
         :param str token: access token to make client requests.
@@ -81,6 +122,11 @@ class _REST(object):
         :param str vizEngine: data visualization library used to render the graphs.
         :param str exportDir: path to local directory where the exported data are stored.
         :param str exportFormat: file format of the exported files.
+        :param bool memoryProfile: if True, the retrieved dataframes are compacted (float32 where precision allows, datetime64 time column, 
+            categorical strings) and the saved memory is reported. Note that in this mode the `time` column is not converted to string.
+        :param RetryPolicy retryPolicy: default retry policy of the client's requests. 
+        :param bool hedge: if True, a query that is not answered within the p95 latency of the selected server is 
+            duplicated on the next best server and the first answer is used (only applies when multiple servers are passed).
         """
 
         self._token = remove_angle_brackets(token) or get_token()
@@ -91,6 +137,9 @@ class _REST(object):
         self._exportDir = exportDir
         self._exportFormat = exportFormat
         self._figureDir = figureDir
+        self._memoryProfile = memoryProfile
+        self._retryPolicy = retryPolicy or RetryPolicy()
+        self._hedge = hedge
         
         save_config(
                     token=self._token, 
@@ -110,51 +159,144 @@ class _REST(object):
                 route,
                 method='GET',
                 payload=None,
-                baseURL=None
+                baseURL=None,
+                retryPolicy=None
                 ):
         baseURL = baseURL or self._baseURL
         headers = {'Authorization': self._token_prefix + self._token}
+        if pa is not None and self.ACCEPT_ARROW:
+            # servers without arrow support ignore the preferred media type and respond with csv
+            headers['Accept'] = ARROW_STREAM_MEDIA_TYPE + ', text/csv;q=0.9'
         if method.upper().strip() == 'GET':
-            return self._atomic_get(route, headers, payload)
+            return self._atomic_get(route, headers, payload, retryPolicy)
         else:
             return None
 
 
-    def _atomic_get(self, route, headers, payload):
+    def _atomic_get(self, route, headers, payload, retryPolicy=None):
         """
         Submits a single GET request. Returns the body in form of pandas dataframe if 200 status.
+        Transient failures (connection errors, timeouts, interrupted transfers, throttling/server errors, and unparsable bodies) are retried 
+        with exponential backoff and jitter according to the retry policy, and are tracked per server by a circuit breaker.
+        While the circuit of the server is open, the request waits (up to `retryPolicy.circuitWait` seconds) for it to let requests through again.
+        If the request ultimately fails, an empty dataframe is returned and the error details are attached to it (`df.attrs['error']`).
+        The number of retries is always reported by `df.attrs['retries']`.
         """               
+        policy = retryPolicy or self._retryPolicy
+        server = (payload or {}).get('servername')
+        breaker = get_breaker(server, self._baseURL)
+        error, attempt, retryable = None, 0, True
+        for attempt in range(policy.maxRetries + 1):
+            if attempt > 0: time.sleep(policy.delay(attempt - 1))
+            if not self._wait_for_circuit(breaker, policy.circuitWait):
+                error = {'code': 'circuit_open', 'message': 'Server %s is temporarily unavailable (circuit open).' % server, 'status_code': None}
+                break
+            start = time.monotonic()
+            try:
+                df = self._get_frame(route, headers, payload, policy)
+            except RequestError as e:
+                error = e.error
+                if not e.retryable: 
+                    # the server is responsive, the request itself is invalid
+                    breaker.record_success()
+                    retryable = False
+                    break
+                breaker.record_failure()
+                if server is not None: BALANCER.record(server, time.monotonic() - start, ok=False, baseURL=self._baseURL)
+                continue
+            breaker.record_success()
+            if server is not None: BALANCER.record(server, time.monotonic() - start, ok=True, baseURL=self._baseURL)
+            df.attrs['retries'] = attempt
+            return df
+
+        error.update({'server': server, 'attempts': attempt + 1, 'retryable': retryable})
+        print_tqdm('REST API Error ({}, status code {}) after {} attempt(s):\n{}'.format(error['code'], error['status_code'], attempt + 1, error['message']), err=True)
+        df = pd.DataFrame({})
+        df.attrs['error'] = error
+        df.attrs['retries'] = attempt
+        return df
+
+
+    @staticmethod
+    def _wait_for_circuit(breaker, maxWait):
+        """Blocks until the circuit breaker lets a request through; returns False if that takes longer than `maxWait` seconds."""
+        deadline = time.monotonic() + maxWait
+        while not breaker.allow():
+            wait = breaker.retry_after()
+            if time.monotonic() + wait > deadline: return False
+            time.sleep(wait)
+        return True
+
+
+    def _get_frame(self, route, headers, payload, policy):
+        """
+        Submits one GET request attempt and parses the response body into a dataframe.
+        Raises RequestError if the attempt fails.
+        """
         df = pd.DataFrame({})
+        queryString = ''
+        if payload is not None:
+            queryString = urlencode(payload)
+        url = self._baseURL + route + queryString
         try:
-            queryString = ''
-            if payload is not None:
-                queryString = urlencode(payload)
-            url = self._baseURL + route + queryString
-            resp = requests.get(url, headers=headers)  
-            resp_text = resp.text   # not a big fan, a bit slow?
-            if len(resp_text) < 50:
-                if resp_text.lower().strip()  == 'unauthorized':
-                    halt('Unauthorized API key!')
-            try:
-                if len(resp_text.strip())>0:
-                    df = pd.read_csv(StringIO(resp_text))
-                    if 'time' in df.columns: 
-                        df['time'] = pd.to_datetime(df['time'])
-                        df['time'] = df['time'].dt.strftime('%Y-%m-%dT%H:%M:%S')
-
-                    # json_list = [orjson.loads(line) for line in resp_text.splitlines()]
-                    # df = pd.DataFrame(json_list, columns=list(json_list[0]))
-            except Exception as e:
-                print_tqdm('REST API Error (status code {})'.format(resp.status_code), err=True)
-                print_tqdm(resp_text, err=True)  
-                print('********* Python Error Msg **********')
-                print(e)
-        except HTTPError as http_error:
-            # look for resp.status_code
-            raise
+            resp = requests.get(url, headers=headers, timeout=self.REQUEST_TIMEOUT)  
+        except requests.exceptions.RequestException as e:
+            # connection errors, timeouts, and transfers interrupted mid-body (ChunkedEncodingError, ContentDecodingError)
+            raise RequestError(type(e).__name__, str(e))
+        arrow = resp.headers.get('Content-Type', '').split(';')[0].strip().lower() == ARROW_STREAM_MEDIA_TYPE
+        if not arrow and len(resp.content) < 50:
+            if resp.text.lower().strip()  == 'unauthorized':
+                halt('Unauthorized API key!')
+        if resp.status_code in policy.retryStatus:
+            raise RequestError('http_error', resp.text[:1000], resp.status_code)
+        if resp.status_code >= 400:
+            raise RequestError('http_error', resp.text[:1000], resp.status_code, retryable=False)
+        try:
+            if arrow:
+                df = self._read_arrow(resp.content)
+            elif len(resp.content.strip())>0:
+                df = pd.read_csv(StringIO(resp.text))
+                # json_list = [orjson.loads(line) for line in resp_text.splitlines()]
+                # df = pd.DataFrame(json_list, columns=list(json_list[0]))
+            if self._memoryProfile:
+                df = self._compact(df)
+            elif 'time' in df.columns: 
+                df['time'] = pd.to_datetime(df['time'])
+                df['time'] = df['time'].dt.strftime('%Y-%m-%dT%H:%M:%S')
+        except Exception as e:
+            body = '' if arrow else resp.text[:1000]
+            raise RequestError('parse_error', '%s\n%s' % (body, e), resp.status_code)
         return df
 
 
+    @staticmethod
+    def _read_arrow(content):
+        """
+        Builds a dataframe from an Arrow IPC stream. 
+        The record batches are consumed directly from the response buffer and the numeric columns 
+        are handed over to pandas without copying, where possible.
+        """
+        reader = pa.ipc.open_stream(pa.py_buffer(content))
+        table = reader.read_all()
+        return table.to_pandas(split_blocks=True, self_destruct=True)
+
+
+    MEMORY_REPORT_MIN_BYTES = 1024 ** 2
+
+    def _compact(self, df):
+        """
+        Compacts a retrieved dataframe and reports the saved memory (see `memoryProfile`).
+        The report is also attached to the dataframe (`df.attrs['memory_profile']`).
+        """
+        df, report = compact_dataframe(df)
+        df.attrs['memory_profile'] = report
+        if report['bytes_before'] >= self.MEMORY_REPORT_MIN_BYTES:
+            print_tqdm(
+                      'Memory profile: %.1f MB -> %.1f MB (%.1f MB saved).' % 
+                      (report['bytes_before'] / 1024**2, report['bytes_after'] / 1024**2, report['bytes_saved'] / 1024**2), 
+                      err=False
+                      )
+        return df
 
 
     @staticmethod
@@ -208,12 +350,59 @@ class _REST(object):
         return msg
 
 
-    def query(self, query, servers=['rainier']):
-        """Takes a custom query and returns the results in form of a dataframe."""
+    def query(self, query, servers=['rainier'], retryPolicy=None, hedge=None):
+        """
+        Takes a custom query and returns the results in form of a dataframe.
+        If more than one server is passed, the query is sent to the fastest healthy one (based on the recently observed latencies and errors).
+        If the query fails after retries (see `retryPolicy`), an empty dataframe is returned with the error details at `df.attrs['error']`.
+        If an identical query is already in flight (e.g. submitted by another thread), the result of that query is reused.
+        """
         # route = '/dataretrieval/query?'     # JSON format, deprecated
         route = '/api/data/query?'     # CSV format      
-        payload = {'query': query, 'servername': random.choice(servers)}
-        return self._request(route, method='GET', payload=payload)        
+        if not self.COALESCE:
+            return self._dispatch(route, query, servers, retryPolicy, hedge)
+        key = (route, query, tuple(sorted(set(servers))), self._baseURL, self._token, self._memoryProfile)
+        df, shared = self._inFlight.do(key, lambda: self._dispatch(route, query, servers, retryPolicy, hedge))
+        # each caller gets its own copy, so that in-place changes by one caller are not seen by the others
+        return df.copy() if shared else df
+
+
+    def _dispatch(self, route, query, servers, retryPolicy, hedge):
+        """
+        Selects the server(s) and submits the query. 
+        If the query fails on the selected server for a transient reason, it fails over to the next ranked server.
+        """
+        ranked = BALANCER.rank(servers, self._baseURL)
+        if hedge is None: hedge = self._hedge
+        if hedge and len(ranked) > 1:
+            return self._hedged_request(route, query, ranked[:2], retryPolicy)
+        for server in ranked:
+            payload = {'query': query, 'servername': server}
+            df = self._request(route, method='GET', payload=payload, retryPolicy=retryPolicy)        
+            if 'error' not in df.attrs or not df.attrs['error'].get('retryable', True): break
+        return df
+
+
+    def _hedged_request(self, route, query, servers, retryPolicy):
+        """
+        Sends the query to the primary server and, if no answer arrives within the server's p95 latency, 
+        sends a duplicate to the secondary server. Returns the first successful answer.
+        """
+        def submit(server):
+            payload = {'query': query, 'servername': server}
+            return self._hedgeExecutor.submit(self._request, route, 'GET', payload, None, retryPolicy)
+
+        primary = submit(servers[0])
+        done, _ = concurrent.futures.wait([primary], timeout=BALANCER.hedge_delay(servers[0], baseURL=self._baseURL))
+        if primary in done: return primary.result()
+        pending = {primary, submit(servers[1])}
+        df = None
+        while pending:
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                df = future.result()
+                if 'error' not in df.attrs: return df
+        return df
 
 
     def stored_proc(self, query, args):
@@ -301,8 +490,28 @@ class _REST(object):
 
     def columns(self, tableName):
         """Returns the list of data set columns."""
+        cols = SCHEMA.columns(self, tableName)
+        if len(cols) < 1: self._validate_table_var(tableName)
+        return cols
+
+
+    def table_schema(self, tableName, servers=["rainier"]):
+        """
+        Returns a dataframe containing the column names and data types of a data set.
+        The schemas are cached locally and reused across sessions.
+        """
+        cols = SCHEMA.schema(self, tableName, servers)
+        if len(cols) < 1: self._validate_table_var(tableName)
+        return pd.DataFrame(cols, columns=['Column', 'Data_Type'])
+
+
+    def table_coverage(self, tableName, servers=["rainier"]):
+        """
+        Returns a single-row dataframe containing the data set's time range and lat/lon/depth extents.
+        The coverage is taken from the catalog statistics and cached locally (see `registry.COVERAGE` to adjust the freshness policy per table).
+        """
         self._validate_table_var(tableName)
-        return list(self.query(f"select top 1 * from {tableName}").columns)
+        return pd.DataFrame([COVERAGE.coverage(self, tableName, servers)])
 
 
     def get_dataset_ID(self, tableName):
@@ -365,7 +574,7 @@ class _REST(object):
         anciTableName = "tblAncillary"
         if CIP: anciTableName = "tblAncillary_CIP"
 
-        anciCols = list(self.query(f"EXEC uspColumns '{anciTableName}'")["Columns"].values)
+        anciCols = SCHEMA.columns(self, anciTableName)
         anciCols = [e for e in anciCols if e not in ('time', 'lat', 'lon', 'depth', 'link')]
         anciCols = ', '.join(anciCols)        
         return self.query(f""" 
@@ -429,10 +638,9 @@ class _REST(object):
 
     def has_field(self, tableName, varName, servers=["rainier"]):
         """Returns a boolean confirming whether a field (varName) exists in a table (data set)."""
-        self._validate_table_var(tableName)
-        query = f"select top 1 * from {tableName}"
-        df = self.query(query, servers)
-        return len(df) > 0 and varName in df.columns
+        cols = SCHEMA.columns(self, tableName, servers)
+        if len(cols) < 1: self._validate_table_var(tableName)
+        return varName in cols
 
 
     def is_grid(self, tableName, varName):
@@ -479,19 +687,50 @@ class _REST(object):
         return self.query(query)
         
 
-    def get_metadata(self, table, variable):
+    @classmethod
+    def clear_metadata_cache(cls):
+        """Removes all of the cached variable metadata (see `get_metadata`)."""
+        with cls._metadataLock:
+            cls._metadataCache.clear()
+
+
+    def get_metadata(self, table, variable, workers=None):
         """
         Returns a dataframe containing the associated metadata.
         The inputs can be string literals (if only one table, and variable is passed) or a list of string literals.
+        The metadata of distinct (table, variable) pairs are retrieved concurrently (at most `workers` requests at a time) and 
+        are kept in the metadata cache (for up to METADATA_TTL seconds; see also `clear_metadata_cache`), so repeated calls do not hit the server.
         """
-        self._validate_table_var(table, variable)
         if isinstance(table, str): table = [table]
         if isinstance(variable, str): variable = [variable]
-        metadata = pd.DataFrame({})    
-        for i in range(len(table)):    
-            df = self.query("EXEC uspVariableMetaData '%s', '%s'" % (table[i], variable[i]))
-            metadata = pd.concat([metadata, df], axis=0, sort=False)
-        return metadata 
+        if len(table) != len(variable): halt('The table and variable lists should have the same length.')
+        pairs = list(zip(table, variable))
+        found = {}
+        with self._metadataLock:
+            for pair in dict.fromkeys(pairs):
+                cached = self._metadataCache.get((self._baseURL,) + pair)
+                if cached is not None and time.monotonic() - cached[0] < self.METADATA_TTL:
+                    self._metadataCache.move_to_end((self._baseURL,) + pair)
+                    found[pair] = cached[1]
+        missing = [p for p in dict.fromkeys(pairs) if p not in found]
+
+        def fetch(pair):
+            self._validate_table_var(pair[0], pair[1])
+            return pair, self.query("EXEC uspVariableMetaData '%s', '%s'" % pair)
+
+        if len(missing) > 0:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=workers or self.METADATA_WORKERS) as executor:
+                fetched = list(executor.map(fetch, missing))
+            with self._metadataLock:
+                for pair, df in fetched:
+                    if len(df) < 1: continue
+                    found[pair] = df
+                    self._metadataCache[(self._baseURL,) + pair] = (time.monotonic(), df)
+                    self._metadataCache.move_to_end((self._baseURL,) + pair)
+                while len(self._metadataCache) > self.METADATA_CACHE_SIZE: self._metadataCache.popitem(last=False)
+        frames = [found[p] for p in pairs if p in found]
+        if len(frames) < 1: return pd.DataFrame({})
+        return pd.concat(frames, axis=0, sort=False)
 
 
     def cruises(self):
@@ -531,6 +770,65 @@ class _REST(object):
         return self.query('EXEC uspCruiseTrajectory %d ' % df.iloc[0]['ID'])
 
 
+    def cruise_ids(self, cruiseNames):
+        """
+        Resolves a list of cruise names (or nicknames) to cruise IDs, using a single query.
+        Names without an exact match are looked up individually (uspCruiseByName); names that still
+        do not match exactly one cruise are reported and left out.
+        Returns a dictionary mapping each resolved name to its cruise ID.
+        """
+        names = list(dict.fromkeys(cruiseNames))
+        if len(names) < 1: return {}
+        quoted = ', '.join("'%s'" % str(name).replace("'", "''") for name in names)
+        df = self.query(f"SELECT ID, Name, Nickname FROM tblCruise WHERE Name IN ({quoted}) OR Nickname IN ({quoted})")
+        ids = {}
+        for name in names:
+            hits = df[(df['Name'].str.lower() == name.lower()) | (df['Nickname'].str.lower() == name.lower())] if len(df) > 0 else df
+            if len(hits) < 1: hits = self.query("EXEC uspCruiseByName '%s' " % name)
+            if len(hits) == 1:
+                ids[name] = int(hits.iloc[0]['ID'])
+            elif len(hits) < 1:
+                print_tqdm('Invalid cruise name: %s' % name, err=True)
+            else:
+                print_tqdm('More than one cruise found for %s. Please provide a more specific cruise name.' % name, err=True)
+        return ids
+
+
+    def cruise_trajectories(self, cruiseNames, tolerance=None, workers=None):
+        """
+        Returns a single dataframe containing the trajectories of several cruises (identified by the `cruise` column).
+        The cruise IDs are resolved with one query and the trajectories are retrieved concurrently.
+        If `tolerance` [degrees] is set, each trajectory is simplified (Douglas-Peucker); see `track.simplify_track`.
+        """
+        from .track import simplify_track
+        if isinstance(cruiseNames, str): cruiseNames = [cruiseNames]
+        ids = self.cruise_ids(cruiseNames)
+
+        def fetch(item):
+            name, cruiseID = item
+            track = self.query('EXEC uspCruiseTrajectory %d ' % cruiseID)
+            if len(track) > 0 and tolerance is not None: track = simplify_track(track, tolerance)
+            track['cruise'] = name
+            return track
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers or self.TRAJECTORY_WORKERS) as executor:
+            tracks = [df for df in executor.map(fetch, ids.items()) if len(df) > 0]
+        if len(tracks) < 1: return pd.DataFrame({})
+        return pd.concat(tracks, axis=0, ignore_index=True, sort=False)
+
+
+    def export_cruise_trajectories(self, cruiseNames, path, tolerance=None, decimals=5, workers=None):
+        """
+        Writes the (optionally simplified) trajectories of several cruises to a compact GeoJSON file,
+        one LineString feature per cruise; see `cruise_trajectories` and `track.tracks_to_geojson`.
+        Returns the FeatureCollection (dict).
+        """
+        from .track import tracks_to_geojson
+        tracks = self.cruise_trajectories(cruiseNames, tolerance=tolerance, workers=workers)
+        if len(tracks) < 1: halt('No cruise trajectory found.')
+        return tracks_to_geojson(tracks, path=path, decimals=decimals)
+
+
     def cruise_variables(self, cruiseName):
         """
         Returns a dataframe containing all registered variables (at Simons CMAP) during a cruise.
@@ -668,16 +966,34 @@ class _REST(object):
         from .match import Match 
         return Match('uspMatch', sourceTable, sourceVar, targetTables, targetVars,
                      dt1, dt2, lat1, lat2, lon1, lon2, depth1, depth2,
-                     temporalTolerance, latTolerance, lonTolerance, depthTolerance).compile()
+                     temporalTolerance, latTolerance, lonTolerance, depthTolerance, api=self).compile()
 
 
 
-    def along_track(self, cruise, targetTables, targetVars, depth1, depth2, temporalTolerance, latTolerance, lonTolerance, depthTolerance):     
+    def along_track(self, cruise, targetTables, targetVars, depth1, depth2, temporalTolerance, latTolerance, lonTolerance, depthTolerance,
+                    segments=1, minDistance=0, minInterval=0, maxPoints=None, workers=None):     
         """
         Takes a cruise name and colocalizes the cruise track with the specified variable(s).
+        By default, the whole cruise bounding box is matched in one go. For long transits, set `segments` to a value
+        greater than one to split the cruise trajectory into time-ordered segments, each matched within its own tight bounding box.
+        The segments are matched in parallel and the results are stitched together in time order.
+        The trajectory can optionally be thinned (see `minDistance`, `minInterval`, and `maxPoints`) to bound the number of returned points.
+
+        :param int segments: number of time-ordered trajectory segments.
+        :param float minDistance: minimum distance between consecutive retained track points [km].
+        :param float minInterval: minimum time interval between consecutive retained track points [hours].
+        :param int maxPoints: upper bound of the number of retained track points.
+        :param int workers: maximum number of segments matched concurrently.
         """
         for i in range(len(targetTables)):
             self._validate_table_var(targetTables[i], targetVars[i])        
+        thinned = minDistance > 0 or minInterval > 0 or maxPoints is not None
+        if segments > 1 or thinned:
+            return self._along_track_segments(
+                                             cruise, targetTables, targetVars, depth1, depth2, 
+                                             temporalTolerance, latTolerance, lonTolerance, depthTolerance,
+                                             segments, minDistance, minInterval, maxPoints, workers
+                                             )
         df = self.cruise_bounds(cruise)     
         return self.match(
                          sourceTable='tblCruise_Trajectory',
@@ -699,3 +1015,50 @@ class _REST(object):
                          )
 
 
+    def _along_track_segments(self, cruise, targetTables, targetVars, depth1, depth2, temporalTolerance, latTolerance, lonTolerance, depthTolerance,
+                              segments, minDistance, minInterval, maxPoints, workers):
+        """
+        Colocalizes the cruise track segment by segment. Each segment is matched within its own tight space-time bounding box.
+        Not meant to be called by user (see `along_track`).
+        """
+        from .track import decimate_track, track_segments
+        cruiseID = self.cruise_by_name(cruise).iloc[0]['ID']
+        track = self.query('EXEC uspCruiseTrajectory %d ' % cruiseID)
+        if len(track) < 1:
+            print_tqdm('No trajectory found for cruise %s.' % cruise, err=True)
+            return pd.DataFrame({})
+        track = decimate_track(track, minDistance, minInterval, maxPoints)
+        bounds = track_segments(track, segments)
+
+        def match_segment(b):
+            return self.match(
+                             sourceTable='tblCruise_Trajectory',
+                             sourceVar=str(cruiseID),
+                             targetTables=targetTables,
+                             targetVars=targetVars,
+                             dt1=b['dt1'],
+                             dt2=b['dt2'],
+                             lat1=b['lat1'],
+                             lat2=b['lat2'],
+                             lon1=b['lon1'],
+                             lon2=b['lon2'],
+                             depth1=depth1,
+                             depth2=depth2,
+                             temporalTolerance=temporalTolerance,
+                             latTolerance=latTolerance,
+                             lonTolerance=lonTolerance,
+                             depthTolerance=depthTolerance
+                             )
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            matched = [df for df in executor.map(match_segment, bounds) if len(df) > 0]
+        if len(matched) < 1: return pd.DataFrame({})
+        df = pd.concat(matched, axis=0, ignore_index=True, sort=False)
+        # the tolerance margins let neighbouring segments pick up the same track points
+        df.drop_duplicates(subset=[c for c in ('time', 'lat', 'lon', 'depth') if c in df.columns], inplace=True)
+        if minDistance > 0 or minInterval > 0 or maxPoints is not None:
+            df = df[df['time'].isin(track['time'])]
+        if 'time' in df.columns: df = df.sort_values('time', kind='mergesort')
+        return df.reset_index(drop=True)
+
+
@@ -7,11 +7,31 @@ Function: Sample (Colocalize) a custom dataframe given list of target variables.
 """
 
 from .cmap import API 
-from .common import (halt, MAX_SAMPLE_SOURCE)
-import datetime
+from .common import (halt, print_tqdm, MAX_SAMPLE_SOURCE)
+from .registry import COVERAGE
+from .resilience import RequestError
+from .progress import ConsoleProgress
 import concurrent.futures
+import time
+from urllib.parse import urlencode
+import numpy as np
 import pandas as pd
-from dateutil.parser import parse
+
+
+# No match is made between a surface target dataset (such as satellite) and observations deeper than this value [m].
+MAX_SURFACE_DEPTH = 10
+# datetime format of the time bounds in the generated queries
+QUERY_DT_FORMAT = "%Y-%m-%d %H:%M:%S"
+# number of source points colocalized by each set-based (block) query
+BLOCK_SIZE = 50
+# maximum length of a url-encoded block query; longer blocks are split (the query is sent in the request url)
+MAX_BLOCK_QUERY_LENGTH = 6000
+# decimal places of the coordinates written into the block queries
+BOUND_DECIMALS = 5
+# source points whose lat/lon/depth agree to this many decimal places (and whose times agree to the second) are sampled once
+DEDUP_DECIMALS = 5
+# number of extra passes over the source points whose queries failed (after the retries of each query)
+FAILED_RETRY_PASSES = 1
 
 
 
@@ -63,14 +83,19 @@ def alias(varName, tableName, aggregations):
     return [f"CMAP_{varName}_{tableName}_{suffix}" for suffix, _ in aggregations]
 
 
-def add_target_columns(df, targets):
+def allocate_target_columns(df, targets):
     """
-    Adds new columns (empty) to the dataframe form each target variable.
+    Preallocates one result array per target column alias, with one entry per row of the source dataframe.
+    The arrays are filled with NaN, or with the existing values if the source already has a column with the same name.
     """    
+    columns = {}
     for env in targets.values():
         for v in env.get("aliases"):
-            if v not in df.columns: df[v] = None
-    return df
+            if v in df.columns:
+                columns[v] = pd.to_numeric(df[v], errors="coerce").to_numpy(dtype=float, copy=True)
+            else:
+                columns[v] = np.full(len(df), np.nan)
+    return columns
     
 
 def add_target_meta(api, targets, aggregations, servers):
@@ -80,10 +105,12 @@ def add_target_meta(api, targets, aggregations, servers):
     and if it's a climatology dataset.
     """   
     for table, env in targets.items():
-        df = api.query(f"SELECT MIN([time]) startTime, MAX([time]) endTime FROM {table}", servers)
-        if len(df) > 0:
-            targets[table]["startTime"] = df.loc[0, "startTime"]
-            targets[table]["endTime"] = df.loc[0, "endTime"]
+        # the temporal coverage is taken from the (cached) catalog stats rather than scanning the table
+        coverage = COVERAGE.coverage(api, table, servers)
+        if coverage["startTime"] is not None:
+            targets[table]["startTime"] = coverage["startTime"]
+            targets[table]["endTime"] = coverage["endTime"]
+        targets[table]["coverage"] = coverage
         targets[table]["hasDepth"] = api.has_field(table, "depth", servers)
         targets[table]["isClimatology"] = api.is_climatology(table, servers)
         targets[table]["aggregations"] = aggregations
@@ -93,82 +120,285 @@ def add_target_meta(api, targets, aggregations, servers):
     return targets
 
 
-def match(df, api, targets, rowIndex, totalRows, replaceWithMonthlyClimatolog, servers):
+def _to_naive(times):
     """
-    Takes a single-row of the source dataframe and colocalizes with the 
-    target variables specified by `targets`. The tolerance parametrs 
-    are also included in `targets`.
-    No match is made between a surface target dataset (such as satellite) and observations deeper than `MAX_SURFACE_DEPTH`.
-    """ 
-    def get_month(dt):
-        return parse(dt).month
-
-    def shift_dt(dt, delta):
-        delta = float(delta)
-        dt = parse(dt)
-        dt += datetime.timedelta(days=delta)
-        return dt.strftime("%Y-%m-%d %H:%M:%S")
-
-    def in_time_window(sourceDT, targetMinDT, targetMaxDT):
-        targetMinDT = targetMinDT.split(".000Z")[0]
-        targetMaxDT = targetMaxDT.split(".000Z")[0]
-        return not (
-                    parse(sourceDT) < parse(targetMinDT) or 
-                    parse(sourceDT) > parse(targetMaxDT)
-                    )
-
-    def construc_query(table, env, t, lat, lon, depth, replaceWithMonthlyClimatolog):
-        variables = env["variables"] 
-        aliases = env["aliases"] 
-        timeTolerance = env["tolerances"][0] 
-        latTolerance = env["tolerances"][1] 
-        lonTolerance = env["tolerances"][2]  
-        depthTolerance = env["tolerances"][3]  
-        hasDepth = env["hasDepth"] 
-        isClimatology = env["isClimatology"]
-        inTimeRange = True
-        if not isClimatology:
-            startTime = env["startTime"]
-            endTime = env["endTime"]    
-            inTimeRange = in_time_window(t, startTime, endTime)
-        selectClause = "SELECT " + ", ".join(
-            [
-                f"{sqlFunc}({v}) CMAP_{v}_{table}_{suffix}"
-                for v in variables
-                for suffix, sqlFunc in env["aggregations"]
-            ]
-        ) + " FROM " + table
-        timeClause = f" WHERE [time] BETWEEN '{shift_dt(t, -timeTolerance)}' AND '{shift_dt(t, timeTolerance)}' "
-        if (not inTimeRange and replaceWithMonthlyClimatolog) or isClimatology: timeClause = f" WHERE [month]={get_month(t)} "
-        latClause = f" AND lat BETWEEN {lat-latTolerance} AND {lat+latTolerance} "
-        lonClause = f" AND lon BETWEEN {lon-lonTolerance} AND {lon+lonTolerance} "
-        depthClause = f" AND depth BETWEEN {depth-depthTolerance} AND {depth+depthTolerance} "
-        if not hasDepth: depthClause = ""                
-        return selectClause + timeClause + latClause + lonClause + depthClause        
-
-
-    if len(df) != 1: halt(f"Invalid dataframe input.\nExpected a single row dataframe but received {len(df)} rows.")
-    MAX_SURFACE_DEPTH = 10
-    rowIndex = df.index.values[0]
-    df.reset_index(drop=True, inplace=True)
-    t= df.iloc[0]["time"]
-    lat = df.iloc[0]["lat"]
-    lon = df.iloc[0]["lon"] 
-    depth = 0
-    if 'depth' in df.columns: depth = df.iloc[0]["depth"]
+    Converts a datetime series to timezone-naive (UTC) datetime64 values.
+    The elements may have different ISO 8601 layouts (e.g. date-only, with or without fractional seconds or UTC offsets); 
+    other layouts are parsed element-wise.
+    """
+    try:
+        times = pd.to_datetime(times, format="ISO8601", utc=True)
+    except ValueError:
+        times = pd.to_datetime(times, format="mixed", utc=True)
+    return times.dt.tz_convert(None)
+
+
+def time_windows(times, targets, replaceWithMonthlyClimatolog):
+    """
+    Parses the source times once and computes, for every target table, the time window of each source point in one vectorized pass.
+    Returns a dictionary keyed by the target table names; each item holds the following arrays (one entry per source point):
+    `lower` and `upper` (time bounds formatted for SQL), `month` (month of the source time), and 
+    `useMonth` (True if the match is made by month, i.e. the target is a climatology, or the source point falls outside 
+    the target's temporal coverage and `replaceWithMonthlyClimatolog` is set).
+    """
+    times = _to_naive(pd.Series(times).reset_index(drop=True))
+    month = times.dt.month.values
+    windows = {}
     for table, env in targets.items():
-        print(f"\rSampling {table} ... {rowIndex+1} / {totalRows}" + " " * 50, end="", flush=True)
-        # do the colocalization if either the target dataset has depth field (it's not satellite, for example) or
-        # the depth of source measurement is less than `MAX_SURFACE_DEPTH`
-        if env["hasDepth"] or depth <= MAX_SURFACE_DEPTH: 
-            query = construc_query(table, env, t, lat, lon, depth, replaceWithMonthlyClimatolog)
-            matchedEnv = api.query(query, servers=servers)
-            if len(matchedEnv)>0:
-                for v in env["aliases"]: df.at[0, v] = matchedEnv.iloc[0][v] 
+        tolerance = pd.to_timedelta(float(env["tolerances"][0]), unit="D")
+        useMonth = np.full(len(times), bool(env["isClimatology"]))
+        if not env["isClimatology"] and "startTime" in env:
+            startTime, endTime = _to_naive(pd.Series([env["startTime"], env["endTime"]]))
+            outside = ((times < startTime) | (times > endTime)).values
+            useMonth = outside & bool(replaceWithMonthlyClimatolog)
+        windows[table] = {
+                         "lower": (times - tolerance).dt.strftime(QUERY_DT_FORMAT).values,
+                         "upper": (times + tolerance).dt.strftime(QUERY_DT_FORMAT).values,
+                         "month": month,
+                         "useMonth": useMonth
+                         }
+    return windows
+
+
+def unique_points(times, lats, lons, depths, decimals=DEDUP_DECIMALS):
+    """
+    Groups the source points by their rounded coordinates (time to the second, lat/lon/depth to `decimals` decimal places).
+    Returns a tuple of two items: the positions of one representative row per unique point (its first occurrence), 
+    and a list holding the positions of all rows that belong to each unique point (in the same order).
+    """
+    keys = pd.DataFrame({
+                        "time": _to_naive(pd.Series(times).reset_index(drop=True)).dt.round("s"),
+                        "lat": np.round(lats, decimals),
+                        "lon": np.round(lons, decimals),
+                        "depth": np.round(depths, decimals)
+                        })
+    codes = keys.groupby(list(keys.columns), sort=False, dropna=False).ngroup().to_numpy()
+    order = np.argsort(codes, kind="stable")
+    bounds = np.flatnonzero(np.diff(codes[order])) + 1
+    members = np.split(order, bounds)
+    representatives = np.array([m[0] for m in members], dtype=int)
+    return representatives, members
+
+
+def construct_query(table, env, window, rowIndex, lat, lon, depth):
+    """
+    Returns the aggregation query that colocalizes a single source point (at `rowIndex`) with a target table.
+    `window` is the item associated with the target table in the output of `time_windows`.
+    """
+    variables = env["variables"] 
+    latTolerance = env["tolerances"][1] 
+    lonTolerance = env["tolerances"][2]  
+    depthTolerance = env["tolerances"][3]  
+    hasDepth = env["hasDepth"] 
+    selectClause = "SELECT " + ", ".join(
+        [
+            f"{sqlFunc}({v}) CMAP_{v}_{table}_{suffix}"
+            for v in variables
+            for suffix, sqlFunc in env["aggregations"]
+        ]
+    ) + " FROM " + table
+    timeClause = f" WHERE [time] BETWEEN '{window['lower'][rowIndex]}' AND '{window['upper'][rowIndex]}' "
+    if window["useMonth"][rowIndex]: timeClause = f" WHERE [month]={window['month'][rowIndex]} "
+    latClause = f" AND lat BETWEEN {lat-latTolerance} AND {lat+latTolerance} "
+    lonClause = f" AND lon BETWEEN {lon-lonTolerance} AND {lon+lonTolerance} "
+    depthClause = f" AND depth BETWEEN {depth-depthTolerance} AND {depth+depthTolerance} "
+    if not hasDepth: depthClause = ""                
+    return selectClause + timeClause + latClause + lonClause + depthClause        
+
+
+def construct_fused_query(targets, windows, rowIndex, lat, lon, depth):
+    """
+    Returns a single statement that colocalizes a source point with several target tables at once.
+    Each per-table aggregation (see `construct_query`) returns exactly one row, so the subqueries are 
+    combined with CROSS JOIN into one row holding the aliases of all target tables.
+    """
+    subqueries = [
+                 f"({construct_query(table, env, windows[table], rowIndex, lat, lon, depth)}) AS t{i}"
+                 for i, (table, env) in enumerate(targets.items())
+                 ]
+    return "SELECT * FROM " + " CROSS JOIN ".join(subqueries)
+
+
+def _timed_query(api, query, servers, progress):
+    """
+    Submits a query and records its outcome (latency, retries, empty result, error) in the `progress` sink, if given.
+    Raises RequestError if the query failed, so that a failure is not mistaken for a point without a match.
+    """
+    t0 = time.monotonic()
+    df = api.query(query, servers=servers)
+    error = df.attrs.get("error")
+    if progress is not None:
+        progress.record_query(
+                             time.monotonic() - t0, 
+                             retries=df.attrs.get("retries", 0), 
+                             empty=len(df) == 0, 
+                             error=error is not None
+                             )
+    if error is not None: 
+        raise RequestError(error.get("code"), error.get("message"), error.get("status_code"), error.get("retryable", True))
     return df
 
 
-def Sample(source, targets, replaceWithMonthlyClimatolog=False, agg_fun=["AVG"], servers=["rossby"]):
+def _sql_number(x, decimals=BOUND_DECIMALS):
+    """Formats a number for an inline SQL statement, rounded to `decimals` decimal places (without trailing zeros)."""
+    return f"{round(float(x), decimals):.{decimals}f}".rstrip("0").rstrip(".")
+
+
+def construct_block_query(table, env, window, rows, lats, lons, depths, useMonth):
+    """
+    Returns a set-based aggregation query that colocalizes a block of source points with a target table at once.
+    The source points (at positions `rows`) are sent as an inline VALUES table holding their time window (or month) and 
+    their rounded coordinates; the spatial tolerances are applied in the join condition. The points are joined with 
+    the target table and aggregated per point (GROUP BY source_id). 
+    If `useMonth` is True the points are matched by month, otherwise by their time window.
+    The LEFT JOIN keeps the points without a match, so the result has one row per point (same as `construct_query`).
+    """
+    latTolerance = env["tolerances"][1] 
+    lonTolerance = env["tolerances"][2]  
+    depthTolerance = env["tolerances"][3]  
+    hasDepth = env["hasDepth"] 
+    fields = ["source_id"] + (["month"] if useMonth else ["t1", "t2"]) + ["lat", "lon"] + (["depth"] if hasDepth else [])
+    values = []
+    for i in rows:
+        row = [str(i)]
+        row += [str(window["month"][i])] if useMonth else [f"'{window['lower'][i]}'", f"'{window['upper'][i]}'"]
+        row += [_sql_number(lats[i]), _sql_number(lons[i])]
+        if hasDepth: row += [_sql_number(depths[i])]
+        values.append("(" + ",".join(row) + ")")
+    selectClause = "SELECT s.source_id, " + ", ".join(
+        [
+            f"{sqlFunc}(t.{v}) CMAP_{v}_{table}_{suffix}"
+            for v in env["variables"]
+            for suffix, sqlFunc in env["aggregations"]
+        ]
+    )
+    fromClause = f" FROM (VALUES {','.join(values)}) AS s({', '.join(fields)}) LEFT JOIN {table} t ON "
+    timeClause = "t.[month]=s.month " if useMonth else "t.[time] BETWEEN s.t1 AND s.t2 "
+    latClause = f" AND t.lat BETWEEN s.lat-{_sql_number(latTolerance)} AND s.lat+{_sql_number(latTolerance)} "
+    lonClause = f" AND t.lon BETWEEN s.lon-{_sql_number(lonTolerance)} AND s.lon+{_sql_number(lonTolerance)} "
+    depthClause = f" AND t.depth BETWEEN s.depth-{_sql_number(depthTolerance)} AND s.depth+{_sql_number(depthTolerance)} " if hasDepth else ""
+    return selectClause + fromClause + timeClause + latClause + lonClause + depthClause + " GROUP BY s.source_id"
+
+
+def block_queries(table, env, window, rows, lats, lons, depths, useMonth, maxLength=MAX_BLOCK_QUERY_LENGTH):
+    """
+    Returns the list of block queries (see `construct_block_query`) that colocalize the source points at positions `rows`.
+    A block whose url-encoded query is longer than `maxLength` characters is split in halves, so that each request 
+    stays within the url length limits of the web servers.
+    """
+    query = construct_block_query(table, env, window, rows, lats, lons, depths, useMonth)
+    if len(rows) < 2 or len(urlencode({"query": query})) <= maxLength: return [query]
+    half = len(rows) // 2
+    return (
+           block_queries(table, env, window, rows[:half], lats, lons, depths, useMonth, maxLength) + 
+           block_queries(table, env, window, rows[half:], lats, lons, depths, useMonth, maxLength)
+           )
+
+
+def match_block(api, targets, windows, rows, lats, lons, depths, servers, progress=None):
+    """
+    Colocalizes a block of source points (at positions `rows`) with the target variables specified by `targets`, 
+    sending one set-based query per target table (see `block_queries`); points matched by month and points 
+    matched by time window are sent separately. 
+    Returns a dataframe indexed by the source point positions holding the target column aliases (points without a match are left out).
+    No match is made between a surface target dataset (such as satellite) and observations deeper than `MAX_SURFACE_DEPTH`.
+    """ 
+    rows = np.asarray(rows)
+    matched = []
+    for table, env in targets.items():
+        window = windows[table]
+        eligible = rows if env["hasDepth"] else rows[depths[rows] <= MAX_SURFACE_DEPTH]
+        frames = []
+        for useMonth in (False, True):
+            subset = eligible[window["useMonth"][eligible] == useMonth]
+            if len(subset) < 1: continue
+            for query in block_queries(table, env, window, subset, lats, lons, depths, useMonth):
+                matchedEnv = _timed_query(api, query, servers, progress)
+                if len(matchedEnv) > 0: frames.append(matchedEnv.set_index("source_id")[env["aliases"]])
+        if len(frames) > 0: matched.append(pd.concat(frames))
+    if len(matched) < 1: return pd.DataFrame()
+    return pd.concat(matched, axis=1)
+
+
+def match(api, targets, windows, rowIndex, lat, lon, depth, servers, progress=None, fuse=False):
+    """
+    Takes a single source point (time-location) and colocalizes it with the 
+    target variables specified by `targets`. The tolerance parametrs 
+    are also included in `targets`. `windows` holds the precomputed time windows
+    of the source points (see `time_windows`) and `rowIndex` is the position of the point in the source dataframe.
+    Returns a dictionary that maps the target column aliases to the matched values (tables without a match are left out).
+    If `fuse` is True, all target tables are colocalized by a single statement (see `construct_fused_query`), 
+    otherwise one query is sent per target table.
+    The outcome of each query (latency, retries, empty result, error) is recorded by the `progress` sink, if given.
+    No match is made between a surface target dataset (such as satellite) and observations deeper than `MAX_SURFACE_DEPTH`.
+    """ 
+    # do the colocalization if either the target dataset has depth field (it's not satellite, for example) or
+    # the depth of source measurement is less than `MAX_SURFACE_DEPTH`
+    eligible = {table: env for table, env in targets.items() if env["hasDepth"] or depth <= MAX_SURFACE_DEPTH}
+    if fuse and len(eligible) > 1:
+        batches = [(eligible, construct_fused_query(eligible, windows, rowIndex, lat, lon, depth))]
+    else:
+        batches = [
+                  ({table: env}, construct_query(table, env, windows[table], rowIndex, lat, lon, depth)) 
+                  for table, env in eligible.items()
+                  ]
+    matched = {}
+    for tables, query in batches:
+        matchedEnv = _timed_query(api, query, servers, progress)
+        if len(matchedEnv)>0:
+            for env in tables.values():
+                for v in env["aliases"]: matched[v] = matchedEnv.iloc[0][v] 
+    return matched
+
+
+def _sample_points(executor, api, targets, windows, representatives, members, lats, lons, depths, servers, progress, fuse, columns):
+    """
+    Colocalizes the representative source points one at a time and writes the results to all member rows of each point.
+    Returns the positions (in `representatives`) of the points whose queries failed; their rows are left untouched.
+    """
+    futures = {
+              executor.submit(match, api, targets, windows, i, lats[i], lons[i], depths[i], servers, progress, fuse): k 
+              for k, i in enumerate(representatives)
+              }
+    failed = []
+    # the results are written by row position, so the completion order does not matter
+    for future in concurrent.futures.as_completed(futures):
+        k = futures[future]
+        try:
+            matched = future.result()
+        except RequestError:
+            failed.append(k)
+            continue
+        for v, val in matched.items(): columns[v][members[k]] = val
+        progress.record_rows(len(members[k]))
+    return failed
+
+
+def _sample_blocks(executor, api, targets, windows, representatives, members, lats, lons, depths, servers, progress, blockSize, columns):
+    """
+    Colocalizes the representative source points block-wise and writes the results to all member rows of each point.
+    Returns the positions (in `representatives`) of the points whose block queries failed; their rows are left untouched.
+    """
+    memberOf = {int(i): members[k] for k, i in enumerate(representatives)}
+    futures = {
+              executor.submit(match_block, api, targets, windows, representatives[block], lats, lons, depths, servers, progress): block
+              for block in np.array_split(np.arange(len(representatives)), max(1, int(np.ceil(len(representatives) / blockSize))))
+              }
+    failed = []
+    for future in concurrent.futures.as_completed(futures):
+        block = futures[future]
+        try:
+            matched = future.result()
+        except RequestError:
+            failed.extend(block.tolist())
+            continue
+        for v in matched.columns:
+            for i, val in zip(matched.index, matched[v].to_numpy()): columns[v][memberOf[int(i)]] = val
+        progress.record_rows(sum(len(members[k]) for k in block))
+    return failed
+
+
+def Sample(source, targets, replaceWithMonthlyClimatolog=False, agg_fun=["AVG"], servers=["rossby"], progress=None, dedup=True, fuse=False, blockSize=None):
     """
     placeholder for the `Sample` class.
 
@@ -202,7 +432,21 @@ def Sample(source, targets, replaceWithMonthlyClimatolog=False, agg_fun=["AVG"],
         Case-insensitive. Defaults to ``["AVG"]`` (the historical behavior).
         Example: ``["AVG", "STDEV", "COUNT"]``.
     :param list servers: list of CMAP server names to query against.
-
+    :param obj progress: a progress/metrics sink (see `progress.ProgressSink`) that tracks the completed rows, query throughput, 
+        latency histogram, retries, empty results, and errors. Defaults to a console progress line refreshed twice per second.
+        The final run report is attached to the returned dataframe (`df.attrs["sampling_report"]`).
+    :param bool dedup: if True, source points with identical (rounded) time-location are colocalized once and the 
+        results are copied to all of the matching rows (see `unique_points`). The number of unique points and 
+        the dedup ratio are added to the run report.
+    :param bool fuse: if True, each source point is colocalized with all of the target tables by a single 
+        statement (one round-trip per point regardless of the number of targets), rather than one query per target table.
+    :param int blockSize: if set, the source points are colocalized in blocks of `blockSize` points; each block is sent 
+        as an inline table and aggregated by one set-based query per target table (see `match_block`).
+        `BLOCK_SIZE` is a reasonable starting value; blocks whose query exceeds `MAX_BLOCK_QUERY_LENGTH` are split. 
+        If None (default), the points are colocalized one at a time.
+
+    Source points whose queries fail (after the retries of each query) are sampled again (`FAILED_RETRY_PASSES` times).
+    The rows that still fail are left as NaN, reported, and listed at `df.attrs["sampling_report"]["failed_rows"]`.
     """
     if len(source) > MAX_SAMPLE_SOURCE: halt(f"Source dataset too large. Maximum allowed number of records is {MAX_SAMPLE_SOURCE}.")
     aggregations = _resolve_aggregations(agg_fun)
@@ -212,14 +456,40 @@ def Sample(source, targets, replaceWithMonthlyClimatolog=False, agg_fun=["AVG"],
         for variable in targets[tableName]["variables"]:
             api._validate_table_var(tableName, variable)
     targets = add_target_meta(api, targets, aggregations, servers)
-    source = add_target_columns(source, targets)
-    dfs = [source.loc[i].to_frame().T for i in range(len(source))]
-    colocalizedList, columns = [], []
+    source = source.reset_index(drop=True)
+    windows = time_windows(source["time"], targets, replaceWithMonthlyClimatolog)
+    columns = allocate_target_columns(source, targets)
+    lats = source["lat"].to_numpy(dtype=float)
+    lons = source["lon"].to_numpy(dtype=float)
+    depths = source["depth"].to_numpy(dtype=float) if "depth" in source.columns else np.zeros(len(source))
+    totalRows = len(source)
+    if dedup:
+        representatives, members = unique_points(source["time"], lats, lons, depths)
+    else:
+        representatives, members = np.arange(totalRows), [np.array([i]) for i in range(totalRows)]
+    if progress is None: progress = ConsoleProgress(label="Sampling")
     print("Sampling starts")
+    progress.start(totalRows)
     with concurrent.futures.ThreadPoolExecutor() as executor:
-        futureObjs = executor.map(match, dfs, [api] * len(dfs), [targets] * len(dfs), list(range(len(dfs))), [len(dfs)] * len(dfs), [replaceWithMonthlyClimatolog]*len(dfs), [servers] * len(dfs))           
-        for fo in futureObjs:
-            if len(colocalizedList) < 1: columns = list(fo.columns)                                                   
-            colocalizedList.append(fo.values.tolist()[0])
-    print("\rSampling finished" + " " * 100, end="")
-    return pd.DataFrame(colocalizedList, columns=columns)
\ No newline at end of file
+        def run(reps, mems):
+            if blockSize is None: 
+                return _sample_points(executor, api, targets, windows, reps, mems, lats, lons, depths, servers, progress, fuse, columns)
+            return _sample_blocks(executor, api, targets, windows, reps, mems, lats, lons, depths, servers, progress, blockSize, columns)
+
+        failed = run(representatives, members)
+        for _ in range(FAILED_RETRY_PASSES):
+            if len(failed) < 1: break
+            failed = [failed[j] for j in run(representatives[failed], [members[k] for k in failed])]
+    failedRows = np.sort(np.concatenate([members[k] for k in failed])) if len(failed) > 0 else np.array([], dtype=int)
+    if len(failedRows) > 0: progress.record_rows(len(failedRows))
+    progress.finish()
+    print("\nSampling finished")
+    if len(failedRows) > 0:
+        print_tqdm(f"{len(failedRows)} source rows could not be sampled due to query errors; see sampling_report['failed_rows'].", err=True)
+    sampled = source.assign(**columns)
+    report = progress.report()
+    report["unique_points"] = len(representatives)
+    report["dedup_ratio"] = totalRows / len(representatives) if len(representatives) > 0 else None
+    report["failed_rows"] = failedRows.tolist()
+    sampled.attrs["sampling_report"] = report
+    return sampled
\ No newline at end of file
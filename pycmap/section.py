@@ -17,6 +17,7 @@ from .common import (
                      inline
                     )
 from .colorMaps import getPalette
+from .pyramid import level_of_detail
 from datetime import datetime
 import warnings
 import numpy as np
@@ -45,20 +46,25 @@ class Section(BaseGraph):
                 self, 
                 data, 
                 variable, 
-                levels=0
+                levels=0,
+                limitsKey=None
                 ):
 
         """
         :param dataframe data: data to be visualized.
         :param str variable: variable name.
         :param int levels: number of contour levels. If zero, heatmap is created. If greater than zero, contour lines are superimposed on the heatmap. Currently, contour graphs are created by plotly library.
+        :param tuple limitsKey: cache key of the data limits (e.g. table, variable, and the space-time box); see `common.get_data_limits`.
         """
         super().__init__()
         self.data = data
         self.variable = variable
-        self.vmin, self.vmax = get_data_limits(self.data[self.variable])
+        self.limitsKey = limitsKey
+        self.vmin, self.vmax = get_data_limits(self.data[self.variable], key=limitsKey)
         self.cmap = getPalette(self.variable)
         self.levels = int(np.abs(levels))        
+        # if True, sections larger than the figure (width x height pixels) are block-averaged before rendering; self.data is kept at full resolution
+        self.lod = True
 
 
     def render(self):
@@ -73,9 +79,9 @@ class Section(BaseGraph):
             warnings.warn('Please switch the vizEngine to "plotly" to create contour plots.', UserWarning)
 
         if vizEngine == 'bokeh':
-            obj = SectionBokeh(self.data, self.variable, self.levels)
+            obj = SectionBokeh(self.data, self.variable, self.levels, limitsKey=self.limitsKey)
         elif vizEngine == 'plotly':
-            obj = SectionPlotly(self.data, self.variable, self.levels)
+            obj = SectionPlotly(self.data, self.variable, self.levels, limitsKey=self.limitsKey)
         return obj         
 
 
@@ -182,7 +188,8 @@ class SectionBokeh(Section):
                 data, 
                 variable,
                 levels,
-                toolbarLocation='right'
+                toolbarLocation='right',
+                limitsKey=None
                 ):
 
         """
@@ -191,7 +198,7 @@ class SectionBokeh(Section):
         :param int levels: number of contour levels. Not applicable to Bokeh library.
         :param str toolbarLocation: location of graph toolbar.
         """
-        super().__init__(data, variable, levels)
+        super().__init__(data, variable, levels, limitsKey)
         self.toolbarLocation = toolbarLocation
         self.tools = get_bokeh_tools()
 
@@ -204,6 +211,8 @@ class SectionBokeh(Section):
         for i in range(len(layers)):
             data, self.xlabel, averagedAlong, x_range, y_range, x, y, dw, dh = self.squeez(layers[i], lat, lon, depth)
             data, _ = self.interpolate(data, lat, lon, depth)
+            # the image extent is taken from the full resolution coordinates
+            if self.lod and data.ndim == 2: (data,), _, _ = level_of_detail([data], np.arange(data.shape[0]), np.arange(data.shape[1]), self.height, self.width)
             p = figure(
                     tools=self.tools, 
                     toolbar_location=self.toolbarLocation, 
@@ -264,14 +273,15 @@ class SectionPlotly(Section):
                 self, 
                 data, 
                 variable,
-                levels
+                levels,
+                limitsKey=None
                 ):
 
         """
         :param dataframe data: data to be visualized.
         :param str variable: variable name.
         """
-        super().__init__(data, variable, levels)
+        super().__init__(data, variable, levels, limitsKey)
         
         
 
@@ -281,21 +291,14 @@ class SectionPlotly(Section):
         layers, titles, lat, lon, depth = self.make_layers()
         for i in range(len(layers)):
             data, self.xlabel, averagedAlong, _, _, _, _, _, _ = self.squeez(layers[i], lat, lon, depth)
-            if len(lon)>len(lat):
-                LON, DEP = np.meshgrid(lon, depth)
-                xvals = LON.flatten()
-                yvals = -1 * DEP.flatten()
-            else:
-                LAT, DEP = np.meshgrid(lat, depth)
-                yvals = -1 * DEP.flatten()
-                xvals = LAT.flatten()
+            xvect, depthVect = (lon, depth) if len(lon)>len(lat) else (lat, depth)
+            if self.lod and data.ndim == 2: (data,), depthVect, xvect = level_of_detail([data], depthVect, xvect, self.height, self.width)
+            X, DEP = np.meshgrid(xvect, depthVect)
+            xvals = X.flatten()
+            yvals = -1 * DEP.flatten()
             vals = data.flatten()
-            hovertext = []
-            for k in range(len(vals)):
-                if len(lon)>len(lat):
-                    hovertext.append('lon: {:.2f}<br>depth [m]: {:.2f}<br>{}: {:.1e}'.format(xvals[k], yvals[k], self.variable + self.unit,vals[k]))
-                else:    
-                    hovertext.append('lat: {:.2f}<br>depth [m]: {:.2f}<br>{}: {:.1e}'.format(xvals[k], yvals[k], self.variable + self.unit,vals[k]))
+            # hover labels are formatted by plotly on the client side; no per-cell strings are created (or embedded in the html)
+            hovertemplate = ('lon' if len(lon)>len(lat) else 'lat') + ': %{x:.2f}<br>depth [m]: %{y:.2f}<br>' + self.variable + self.unit + ': %{z:.1e}<extra></extra>'
             if self.levels == 0:
                 data = [
                         go.Heatmap(
@@ -305,8 +308,7 @@ class SectionPlotly(Section):
                                     colorscale=self.cmap,
                                     zmin=self.vmin,
                                     zmax=self.vmax,
-                                    hoverinfo='text',
-                                    text=hovertext
+                                    hovertemplate=hovertemplate
                                     )
                         ]
             elif self.levels > 0:
@@ -316,8 +318,7 @@ class SectionPlotly(Section):
                                     y=yvals,
                                     z=vals,
                                     colorscale=self.cmap,
-                                    hoverinfo='text',
-                                    text=hovertext,
+                                    hovertemplate=hovertemplate,
                                     connectgaps=False,
                                     contours=dict(
                                         coloring='heatmap',
@@ -0,0 +1,62 @@
+"""
+Function: Coalesces identical in-flight requests.
+"""
+
+
+import threading
+
+
+
+class _Call(object):
+    """Holds the state of an in-flight call."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+
+class SingleFlight(object):
+    """
+    Makes sure that only one execution of a call is in flight for a given key at a time.
+    Callers that arrive while the call is running wait for it to finish and receive the same result
+    (or the same exception) instead of executing the call again.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+
+    def do(self, key, fn):
+        """
+        Executes `fn` (without arguments) unless a call with the same key is already in flight.
+        Returns a tuple of the result and a boolean which is True if the result has been shared by more than one caller.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+            else:
+                call.waiters += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None: raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+                shared = call.waiters > 0
+            call.done.set()
+        return call.result, shared
@@ -0,0 +1,173 @@
+"""
+Function: Mergeable streaming summaries (approximate quantiles and histograms) of data consumed in chunks.
+"""
+
+
+import numpy as np
+
+
+
+class QuantileSketch(object):
+    """
+    KLL-style approximate quantile sketch.
+    Values are kept in a hierarchy of compactors; an item at level h stands for 2**h values. Whenever a level holds more than `k` items,
+    it is sorted and every other item (with a random offset) is promoted to the next level. The memory footprint is O(k log(n/k)),
+    a chunk of n values is absorbed in near-linear time, and sketches built on separate chunks can be merged.
+    """
+
+    def __init__(self, k=256, seed=None):
+        """
+        :param int k: capacity of each compactor; larger values give more accurate quantiles.
+        :param int seed: seed of the random generator used in compactions.
+        """
+        self.k = k
+        self.levels = [np.empty(0)]
+        self.count = 0
+        self.min = np.inf
+        self.max = -np.inf
+        self._rng = np.random.default_rng(seed)
+
+
+    # large inputs are absorbed in blocks of this size, so that no more than one block is sorted at a time
+    BLOCK_SIZE = 65536
+
+    def update(self, values):
+        """Adds an array of values (NaNs are ignored) to the sketch."""
+        values = np.asarray(values, dtype=float).ravel()
+        values = values[~np.isnan(values)]
+        if len(values) < 1: return self
+        self.count += len(values)
+        self.min = min(self.min, np.min(values))
+        self.max = max(self.max, np.max(values))
+        for i in range(0, len(values), self.BLOCK_SIZE):
+            self.levels[0] = np.concatenate([self.levels[0], values[i:i+self.BLOCK_SIZE]])
+            self._compress()
+        return self
+
+
+    def merge(self, other):
+        """Merges another sketch into this one."""
+        while len(self.levels) < len(other.levels): self.levels.append(np.empty(0))
+        for h, items in enumerate(other.levels): self.levels[h] = np.concatenate([self.levels[h], items])
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+
+    def _compress(self):
+        h = 0
+        while h < len(self.levels):
+            if len(self.levels[h]) > self.k:
+                items = np.sort(self.levels[h])
+                # an odd item out stays at the current level
+                keep = items[len(items)-len(items)%2:]
+                items = items[:len(items)-len(items)%2]
+                if h + 1 == len(self.levels): self.levels.append(np.empty(0))
+                self.levels[h+1] = np.concatenate([self.levels[h+1], items[self._rng.integers(2)::2]])
+                self.levels[h] = keep
+            h += 1
+
+
+    def quantile(self, q):
+        """Returns the approximate q-th quantile(s) (0 <= q <= 1) of the values added so far (NaN if empty)."""
+        q = np.asarray(q, dtype=float)
+        if self.count < 1: return np.full(q.shape, np.nan) if q.ndim else np.nan
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(level), 2.**h) for h, level in enumerate(self.levels)])
+        order = np.argsort(items)
+        items, cumWeights = items[order], np.cumsum(weights[order])
+        ind = np.minimum(np.searchsorted(cumWeights, q * cumWeights[-1]), len(items)-1)
+        res = np.where(q <= 0, self.min, np.where(q >= 1, self.max, items[ind]))
+        return res if q.ndim else float(res)
+
+
+
+
+class StreamingHistogram(object):
+    """
+    Histogram whose counts are updated incrementally, one chunk of data at a time.
+    Values below the first (above the last) edge are counted as underflow (overflow), unless the histogram is allowed to 
+    extend its (equal-width) bins to cover them (see `extend`). Histograms with the same edges can be merged.
+    """
+
+    def __init__(self, edges, maxBins=None):
+        """
+        :param array edges: monotonically increasing bin edges.
+        :param int maxBins: maximum number of bins when the bins are extended; defaults to twice the initial number of bins.
+        """
+        self.edges = np.asarray(edges, dtype=float)
+        self.counts = np.zeros(len(self.edges)-1, dtype=np.int64)
+        self.maxBins = max(3, maxBins or 2 * len(self.counts))
+        self.underflow = 0
+        self.overflow = 0
+
+
+    @classmethod
+    def from_sketch(cls, sketch, bins=50, quant=0):
+        """
+        Creates an empty histogram with `bins` equal-width bins spanning the `quant` and `1-quant` quantiles of a sketch
+        (typically built on a warm-up chunk of the data). With `quant=0` the bins span the full range of the sketch.
+        """
+        low, high = sketch.quantile([quant, 1-quant])
+        if not high > low: low, high = low - 0.5, high + 0.5
+        return cls(np.linspace(low, high, bins+1))
+
+
+    def extend(self, low, high):
+        """
+        Extends the equal-width bins so that they cover [low, high] without losing any counts. Empty bins are added on either side;
+        whenever more than `maxBins` bins would be needed, adjacent pairs of bins are merged (the bin width is doubled).
+        """
+        start, width = self.edges[0], self.edges[1] - self.edges[0]
+        counts = self.counts
+        while True:
+            nLeft = max(0, int(np.ceil((start - low) / width)))
+            nRight = max(0, int(np.ceil((high - start) / width)) - len(counts))
+            if len(counts) + nLeft + nRight <= self.maxBins: break
+            if len(counts) % 2: counts = np.append(counts, 0)
+            counts = counts.reshape(-1, 2).sum(axis=1)
+            width *= 2
+        self.counts = np.concatenate([np.zeros(nLeft, dtype=np.int64), counts, np.zeros(nRight, dtype=np.int64)])
+        self.edges = start - nLeft * width + width * np.arange(len(self.counts) + 1)
+        # guard against round-off at the outer edges
+        self.edges[0], self.edges[-1] = min(self.edges[0], low), max(self.edges[-1], high)
+        return self
+
+
+    def update(self, values, extend=False):
+        """
+        Adds an array of values (NaNs are ignored) to the histogram.
+        If `extend` is True, the bins are first extended to cover the values (see `extend`), so that none are counted as underflow/overflow.
+        """
+        values = np.asarray(values, dtype=float).ravel()
+        values = values[~np.isnan(values)]
+        if extend and len(values) > 0 and (values.min() < self.edges[0] or values.max() > self.edges[-1]): 
+            self.extend(values.min(), values.max())
+        self.counts += np.histogram(values, bins=self.edges)[0]
+        self.underflow += int(np.sum(values < self.edges[0]))
+        self.overflow += int(np.sum(values > self.edges[-1]))
+        return self
+
+
+    def merge(self, other):
+        """Merges another histogram (with identical edges) into this one."""
+        if not np.array_equal(self.edges, other.edges): raise ValueError('Only histograms with identical bin edges can be merged.')
+        self.counts += other.counts
+        self.underflow += other.underflow
+        self.overflow += other.overflow
+        return self
+
+
+    @property
+    def total(self):
+        """Number of values added to the histogram, including underflow and overflow."""
+        return int(self.counts.sum()) + self.underflow + self.overflow
+
+
+    def density(self):
+        """Returns the probability density of each bin (normalized over the values within the edges, as numpy.histogram does)."""
+        inRange = self.counts.sum()
+        if inRange < 1: return np.zeros(len(self.counts))
+        return self.counts / (inRange * np.diff(self.edges))
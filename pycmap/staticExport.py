@@ -0,0 +1,194 @@
+"""
+Function: Batch generation of static (png) figures.
+"""
+
+
+import os
+import zlib
+import struct
+import concurrent.futures
+import numpy as np
+from .colorMaps import PALETTES
+
+
+
+def write_png(path, pixels):
+    """
+    Writes an image to a png file without any plotting library (zlib-compressed, 8-bit RGB or RGBA).
+
+    :param str path: path to the png file.
+    :param array pixels: uint8 array of shape (height, width, 3) or (height, width, 4); the first row is the top of the image.
+    """
+    pixels = np.ascontiguousarray(pixels, dtype=np.uint8)
+    height, width, channels = pixels.shape
+    colorType = {3: 2, 4: 6}[channels]
+    # each scanline starts with the filter type byte (0: no filter)
+    raw = np.zeros((height, 1 + width * channels), dtype=np.uint8)
+    raw[:, 1:] = pixels.reshape(height, width * channels)
+
+    def chunk(tag, data):
+        return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data) & 0xffffffff)
+
+    with open(path, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n')
+        f.write(chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, colorType, 0, 0, 0)))
+        f.write(chunk(b'IDAT', zlib.compress(raw.tobytes(), 6)))
+        f.write(chunk(b'IEND', b''))
+
+
+def colorize(layer, lut, vmin, vmax):
+    """
+    Maps a 2D layer onto the colors of a lookup table (linear scaling between vmin and vmax).
+    Returns a uint8 RGBA image; NaN cells are transparent.
+    The first row of the layer is placed at the bottom of the image (latitude/depth increasing upwards).
+    """
+    layer = np.asarray(layer, dtype=float)[::-1]
+    valid = np.isfinite(layer)
+    scaled = (np.where(valid, layer, vmin) - vmin) / (vmax - vmin if vmax > vmin else 1.)
+    ind = np.clip((scaled * (len(lut) - 1)).round(), 0, len(lut) - 1).astype(np.intp)
+    image = np.empty(layer.shape + (4,), dtype=np.uint8)
+    image[..., :3] = lut[ind]
+    image[..., 3] = np.where(valid, 255, 0)
+    return image
+
+
+def heatmap_png(path, layer, cmap, vmin, vmax, scale=1):
+    """
+    Fast path for plain heatmaps: colorizes a 2D layer and writes it as a png file (one pixel per cell,
+    enlarged `scale` times), without any plotting library. Axes, titles and color bars are not drawn.
+    """
+    image = colorize(layer, PALETTES.lut(cmap), vmin, vmax)
+    if scale > 1: image = image.repeat(scale, axis=0).repeat(scale, axis=1)
+    write_png(path, image)
+
+
+
+
+def start_renderer():
+    """
+    Starts a persistent static image renderer in the current process, so that it is reused by all subsequent figures.
+    With kaleido >= 1 (required by plotly >= 6.1), every `write_image` call launches its own Chrome process unless 
+    the kaleido sync server is running; kaleido 0.x keeps its renderer alive once the first image is made.
+    Returns True if a persistent renderer is running.
+    """
+    try:
+        import kaleido
+    except ImportError:
+        return False
+    if hasattr(kaleido, 'start_sync_server'):
+        kaleido.start_sync_server(silence_warnings=True)
+        return True
+    import plotly.io as pio
+    import plotly.graph_objs as go
+    try:
+        pio.to_image(go.Figure(), format='png')
+    except Exception:
+        return False
+    return True
+
+
+def _write_image(figure, path, kwargs):
+    import plotly.io as pio
+    pio.write_image(figure, path, **kwargs)
+    return path
+
+
+def _write_images(figures, paths, kwargs):
+    """Renders a list of figures in one call (plotly.io.write_images, where available)."""
+    import plotly.io as pio
+    if hasattr(pio, 'write_images'):
+        pio.write_images(figures, paths, **kwargs)
+    else:
+        for figure, path in zip(figures, paths): pio.write_image(figure, path, **kwargs)
+    return paths
+
+
+
+class BatchRenderer(object):
+    """
+    Renders plotly figures to static images in parallel, using a pool of worker processes.
+    Each worker starts a persistent image renderer (see `start_renderer`) and reuses it for all of the figures it receives,
+    instead of starting a renderer (Chrome) per figure.
+    While a BatchRenderer is active (used as a context manager), the static plots of the graph objects
+    (`plotlyConfig['staticPlot']=True`) are queued on it rather than rendered one at a time.
+    """
+
+    def __init__(self, workers=None, **kwargs):
+        """
+        :param int workers: number of worker processes (defaults to the number of CPUs).
+        :param dict kwargs: keyword arguments passed to `plotly.io.write_image` (e.g. width, height, scale).
+        """
+        self.kwargs = kwargs
+        self.workers = workers or os.cpu_count() or 1
+        self._pool = concurrent.futures.ProcessPoolExecutor(max_workers=self.workers, initializer=start_renderer)
+        self._futures = []
+
+
+    def submit(self, figure, path):
+        """Queues a figure (plotly figure or dict) to be rendered to `path`. Returns a future holding the path."""
+        if hasattr(figure, 'to_dict'): figure = figure.to_dict()
+        future = self._pool.submit(_write_image, figure, path, self.kwargs)
+        self._futures.append(future)
+        return future
+
+
+    def render_all(self, figures, paths):
+        """
+        Renders a collection of figures to their corresponding paths and returns the list of written paths.
+        The figures are split into one batch per worker, and each batch is rendered by a single `write_images` call.
+        """
+        figures = [fig.to_dict() if hasattr(fig, 'to_dict') else fig for fig in figures]
+        paths = list(paths)
+        futures = [
+                  self._pool.submit(_write_images, figures[i::self.workers], paths[i::self.workers], self.kwargs)
+                  for i in range(min(self.workers, len(paths)))
+                  ]
+        for f in futures: f.result()
+        return paths
+
+
+    def wait(self):
+        """Blocks until all of the queued figures are rendered; raises the first rendering error, if any."""
+        futures, self._futures = self._futures, []
+        for f in concurrent.futures.as_completed(futures): f.result()
+
+
+    def close(self):
+        """Waits for the queued figures and shuts the worker processes down (even if a figure failed to render)."""
+        try:
+            self.wait()
+        finally:
+            self._pool.shutdown()
+
+
+    def __enter__(self):
+        global ACTIVE_RENDERER
+        self._previous, ACTIVE_RENDERER = ACTIVE_RENDERER, self
+        return self
+
+
+    def __exit__(self, excType, exc, tb):
+        global ACTIVE_RENDERER
+        ACTIVE_RENDERER = self._previous
+        if excType is None:
+            self.close()
+        else:
+            # do not let a rendering error hide the exception raised within the block
+            futures, self._futures = self._futures, []
+            for f in futures: f.cancel()
+            self._pool.shutdown(wait=False)
+
+
+
+
+# the batch renderer used by the graph objects' static plots (if any)
+ACTIVE_RENDERER = None
+
+
+def save_static(figure, path):
+    """Renders a plotly figure to a static image, through the active batch renderer if there is one."""
+    if ACTIVE_RENDERER is not None:
+        ACTIVE_RENDERER.submit(figure, path)
+    else:
+        import plotly.io as pio
+        pio.write_image(figure, path)
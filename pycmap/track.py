@@ -0,0 +1,154 @@
+"""
+Function: Helper functions to thin and partition cruise trajectories.
+"""
+
+
+import json
+import numpy as np
+import pandas as pd
+
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """Returns the great-circle distance [km] between pairs of points (vectorized)."""
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+def decimate_track(track, minDistance=0, minInterval=0, maxPoints=None):
+    """
+    Thins a cruise trajectory by distance and/or time.
+    A point is kept only if it is at least `minDistance` [km] and `minInterval` [hours] apart from the last kept point.
+    If `maxPoints` is set, the thinned track is further subsampled uniformly so that it has no more than `maxPoints` records.
+    The first and last points of the track are always kept.
+
+    :param dataframe track: cruise trajectory (must have time, lat, and lon columns).
+    :param float minDistance: minimum distance between consecutive kept points [km].
+    :param float minInterval: minimum time interval between consecutive kept points [hours].
+    :param int maxPoints: upper bound of the number of kept points.
+    """
+    track = track.sort_values('time').reset_index(drop=True)
+    if len(track) < 3: return track
+    lat = track['lat'].values.astype(float)
+    lon = track['lon'].values.astype(float)
+    hours = pd.to_datetime(track['time']).values.astype('datetime64[s]').astype(np.int64) / 3600.
+    keep = np.zeros(len(track), dtype=bool)
+    keep[0] = True
+    last = 0
+    if minDistance > 0 or minInterval > 0:
+        for i in range(1, len(track)):
+            if (
+                haversine(lat[last], lon[last], lat[i], lon[i]) >= minDistance and
+                hours[i] - hours[last] >= minInterval
+                ):
+                keep[i] = True
+                last = i
+    else:
+        keep[:] = True
+    keep[-1] = True
+    ind = np.flatnonzero(keep)
+    if maxPoints is not None and len(ind) > maxPoints:
+        ind = ind[np.unique(np.linspace(0, len(ind)-1, int(maxPoints)).round().astype(int))]
+    return track.iloc[ind].reset_index(drop=True)
+
+
+def track_segments(track, segments):
+    """
+    Splits a time-ordered cruise trajectory into (at most) `segments` consecutive pieces with roughly equal number of points.
+    Returns a list of dictionaries, each holding the tight space-time bounding box of one segment (dt1, dt2, lat1, lat2, lon1, lon2).
+    Consecutive segments do not share any trajectory point.
+
+    :param dataframe track: cruise trajectory (must have time, lat, and lon columns).
+    :param int segments: number of segments.
+    """
+    track = track.sort_values('time').reset_index(drop=True)
+    segments = max(1, min(int(segments), len(track)))
+    bounds = []
+    for piece in np.array_split(np.arange(len(track)), segments):
+        if len(piece) == 0: continue
+        seg = track.iloc[piece]
+        bounds.append({
+                      'dt1': str(seg['time'].iloc[0]),
+                      'dt2': str(seg['time'].iloc[-1]),
+                      'lat1': float(seg['lat'].min()),
+                      'lat2': float(seg['lat'].max()),
+                      'lon1': float(seg['lon'].min()),
+                      'lon2': float(seg['lon'].max())
+                      })
+    return bounds
+
+
+
+def douglas_peucker(x, y, tolerance):
+    """
+    Douglas-Peucker line simplification. 
+    Returns a boolean mask of the points kept so that no dropped point is farther than `tolerance` (in the units of x and y)
+    from the simplified line. The first and last points are always kept.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    keep = np.zeros(len(x), dtype=bool)
+    if len(x) < 3: 
+        keep[:] = True
+        return keep
+    keep[0] = keep[-1] = True
+    stack = [(0, len(x)-1)]
+    while stack:
+        i, j = stack.pop()
+        if j - i < 2: continue
+        dx, dy = x[j] - x[i], y[j] - y[i]
+        px, py = x[i+1:j] - x[i], y[i+1:j] - y[i]
+        # distance to the segment (not the infinite line), so that tracks doubling back on themselves are preserved
+        norm2 = dx * dx + dy * dy
+        t = np.clip((px * dx + py * dy) / norm2, 0, 1) if norm2 > 0 else 0
+        dist = np.hypot(px - t * dx, py - t * dy)
+        k = int(np.argmax(dist))
+        if dist[k] > tolerance:
+            k += i + 1
+            keep[k] = True
+            stack.extend([(i, k), (k, j)])
+    return keep
+
+
+def simplify_track(track, tolerance):
+    """
+    Simplifies a cruise trajectory using the Douglas-Peucker algorithm on its (lon, lat) coordinates.
+
+    :param dataframe track: cruise trajectory (must have lat and lon columns; ordered by time if it has a time column).
+    :param float tolerance: maximum deviation of the simplified track from the original one [degrees].
+    """
+    if 'time' in track.columns: track = track.sort_values('time')
+    track = track.reset_index(drop=True)
+    return track[douglas_peucker(track['lon'].values, track['lat'].values, tolerance)].reset_index(drop=True)
+
+
+
+def tracks_to_geojson(tracks, path=None, decimals=5):
+    """
+    Converts cruise trajectories to a GeoJSON FeatureCollection with one LineString feature per cruise.
+    Coordinates are rounded to `decimals` digits (5 digits ~ 1 m) and the file is written without whitespace, to keep it compact.
+    Returns the FeatureCollection (dict); if `path` is given, it is also stored as a json file.
+
+    :param dataframe tracks: cruise trajectories (must have lat, lon and cruise columns; ordered by time within each cruise).
+    :param str path: path to the GeoJSON file.
+    :param int decimals: number of decimal digits of the coordinates.
+    """
+    features = []
+    for cruise, track in tracks.groupby('cruise', sort=False):
+        coords = np.round(track[['lon', 'lat']].values.astype(float), decimals)
+        properties = {'cruise': cruise, 'points': len(coords)}
+        if 'time' in track.columns:
+            properties['startTime'], properties['endTime'] = str(track['time'].iloc[0]), str(track['time'].iloc[-1])
+        features.append({
+                        'type': 'Feature',
+                        'properties': properties,
+                        'geometry': {'type': 'LineString', 'coordinates': coords.tolist()}
+                        })
+    collection = {'type': 'FeatureCollection', 'features': features}
+    if path is not None:
+        with open(path, 'w') as f:
+            json.dump(collection, f, separators=(',', ':'))
+    return collection
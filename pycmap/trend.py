@@ -29,7 +29,9 @@ from bokeh.models import (
                           LinearColorMapper, 
                           BasicTicker, 
                           ColorBar, 
-                          DatetimeTickFormatter
+                          DatetimeTickFormatter,
+                          ColumnDataSource,
+                          LogColorMapper
                           )
 import plotly
 import plotly.graph_objs as go
@@ -57,6 +59,14 @@ class Trend(BaseGraph):
         self.data = data
         self.variable = variable
         self.line = line
+        # if True, glyphs are drawn by WebGL (bokeh output_backend='webgl', plotly Scattergl)
+        self.webgl = True
+        # scatter plots with more points than this are rendered as an aggregated raster (2D histogram of point counts)
+        self.rasterThreshold = 100000
+        # bokeh ColumnDataSource holding the plotted points; assign the source of another plot to link (share) their data
+        self.source = None
+        # names of the x and y columns of `source`
+        self.sourceColumns = ('x', 'y')
 
 
     def render(self):
@@ -64,6 +74,42 @@ class Trend(BaseGraph):
         super().render()
 
 
+    def rasterize(self):
+        """
+        Returns True if the points should be rendered as an aggregated raster rather than individual markers
+        (numeric scatter plots with more points than `rasterThreshold`).
+        """
+        return not self.line and len(self.y) > self.rasterThreshold and np.issubdtype(np.asarray(self.x).dtype, np.number)
+
+
+    def point_counts(self, nx, ny):
+        """
+        Aggregates the (x, y) points into a `ny` by `nx` grid of point counts (empty cells are NaN).
+        Returns the counts and the x and y bin edges.
+        """
+        x, y = np.asarray(self.x, dtype=float), np.asarray(self.y, dtype=float)
+        valid = np.isfinite(x) & np.isfinite(y)
+        counts, xEdges, yEdges = np.histogram2d(x[valid], y[valid], bins=(nx, ny))
+        counts = counts.T
+        counts[counts == 0] = np.nan
+        return counts, xEdges, yEdges
+
+
+    @staticmethod
+    def shared_source(xs, ys):
+        """
+        Returns a single bokeh ColumnDataSource holding the x column ('x') and the y columns ('y0', 'y1', ...) of several plots,
+        to be assigned to each plot's `source` (with `sourceColumns` set to ('x', 'y<i>')) so that selections are linked across the plots.
+        Returns None if the x columns (pandas series) are not identical; the plots then keep their own sources.
+        """
+        if len(xs) < 2: return None
+        x = xs[0].reset_index(drop=True)
+        if any(not x.equals(other.reset_index(drop=True)) for other in xs[1:]): return None
+        data = {'x': x.values}
+        data.update({'y%d' % i: np.asarray(y) for i, y in enumerate(ys)})
+        return ColumnDataSource(data=data)
+
+
     def graph_obj(self):
         """Creates an instance from one of the derived classes of Trend."""
         vizEngine = get_vizEngine().lower().strip()
@@ -133,9 +179,14 @@ class TrendBokeh(Trend):
                     toolbar_location=self.toolbarLocation, 
                     plot_width=self.width, 
                     plot_height=self.height,
-                    title=self.title
+                    title=self.title,
+                    output_backend='webgl' if self.webgl else 'canvas'
                     )
 
+        if self.rasterize():
+            self.render_raster(p)
+            return
+
         if self.timeSeries and (isinstance(self.x[0], str) or isinstance(self.x[0], int) or isinstance(self.x[0], np.int64)):
             self.x = self.x.astype(str)    
             p.xaxis.ticker = np.arange(len(self.x))
@@ -144,9 +195,13 @@ class TrendBokeh(Trend):
 
         p.yaxis.axis_label = self.ylabel
         p.xaxis.axis_label = self.xlabel        
+        # markers and line share a single data source (which may be shared with other plots as well)
+        if self.source is None: self.source, self.sourceColumns = ColumnDataSource(data={'x': self.x, 'y': self.y}), ('x', 'y')
+        xColumn, yColumn = self.sourceColumns
         cr = p.circle(
-                    self.x, 
-                    self.y, 
+                    xColumn, 
+                    yColumn, 
+                    source=self.source,
                     fill_color=self.fillColor, 
                     line_color=None, 
                     hover_fill_color=self.hoverFillColor, 
@@ -158,8 +213,9 @@ class TrendBokeh(Trend):
                     )
         if self.line:            
             p.line(
-                self.x, 
-                self.y, 
+                xColumn, 
+                yColumn, 
+                source=self.source,
                 line_color=self.lineColor, 
                 line_width=self.lineWidth, 
                 legend=self.legend
@@ -182,6 +238,34 @@ class TrendBokeh(Trend):
         show(p)
 
 
+    def render_raster(self, p):
+        """Displays the point counts aggregated on a grid matching the figure resolution (see `point_counts`)."""
+        counts, xEdges, yEdges = self.point_counts(self.width // 2, self.height // 2)
+        p.yaxis.axis_label = self.ylabel
+        p.xaxis.axis_label = self.xlabel        
+        colorMapper = LogColorMapper(palette=all_palettes['Viridis'][256], low=1, high=max(np.nanmax(counts), 2))
+        p.image(
+                image=[counts], 
+                color_mapper=colorMapper, 
+                x=xEdges[0], 
+                y=yEdges[0], 
+                dw=xEdges[-1]-xEdges[0], 
+                dh=yEdges[-1]-yEdges[0]
+                )
+        p.add_tools(HoverTool(tooltips=[('x', '$x'), ('y', '$y'), ('points', '@image')], mode='mouse'))
+        colorBar = ColorBar(
+                            color_mapper=colorMapper, 
+                            ticker=BasicTicker(),
+                            label_standoff=12, 
+                            border_line_color=None, 
+                            location=(0,0),
+                            title='points'
+                            )
+        p.add_layout(colorBar, 'right')
+        if not inline(): output_file(get_figure_dir() + self.variable + ".html", title=self.variable)        
+        show(p)
+
+
 
 
 
@@ -215,10 +299,15 @@ class TrendPlotly(Trend):
         """Display the graph object."""
         super().render()
 
+        if self.rasterize():
+            self.render_raster()
+            return
+
         mode = 'markers'
         if self.line: mode = 'lines+markers'            
+        scatter = go.Scattergl if self.webgl else go.Scatter
         data = [
-                go.Scatter(
+                scatter(
                              x=self.x,
                              y=self.y,
                              marker=dict(
@@ -247,3 +336,28 @@ class TrendPlotly(Trend):
                            yaxis={'title': self.ylabel}
                           )  
         self._save_plotly_(go, data, layout)                     
+
+
+    def render_raster(self):
+        """Displays the point counts aggregated on a grid matching the figure resolution (see `point_counts`)."""
+        counts, xEdges, yEdges = self.point_counts(self.width // 2, self.height // 2)
+        data = [
+                go.Heatmap(
+                          x=(xEdges[:-1] + xEdges[1:]) / 2,
+                          y=(yEdges[:-1] + yEdges[1:]) / 2,
+                          z=np.log10(counts),
+                          colorscale='Viridis',
+                          customdata=counts,
+                          colorbar={'title': 'log10(points)'},
+                          hovertemplate='x: %{x:.3g}<br>y: %{y:.3g}<br>points: %{customdata}<extra></extra>'
+                          )
+               ]
+        layout = go.Layout(
+                           autosize=False,
+                           title=self.title,
+                           width=self.width,
+                           height=self.height,
+                           xaxis={'title': self.xlabel},
+                           yaxis={'title': self.ylabel}
+                          )  
+        self._save_plotly_(go, data, layout)
@@ -9,6 +9,7 @@ Function: Implements the top-level visualization logic.
 from .cmap import API  # noqa
 from .common import (
                      get_vizEngine,
+                     halt,
                      print_tqdm,
                      inline,
                      make_filename_by_table_var,
@@ -22,6 +23,7 @@ from .trend import Trend
 from .annotatedHeatmap import AnnotatedHeatmap
 from .export import Export
 from .foliumHeat import folium_map, folium_cruise_track
+from .sketch import QuantileSketch, StreamingHistogram
 import numpy as np
 import pandas as pd
 from tqdm import tqdm 
@@ -46,25 +48,64 @@ def no_data_reaction(itnum, table, variable, dt1, dt2, lat1, lat2, lon1, lon2, d
     return    
 
 
-def plot_hist(tables, variables, dt1, dt2, lat1, lat2, lon1, lon2, depth1, depth2, exportDataFlag=False, show=True):
+def time_chunks(dt1, dt2, days):
+    """Splits the time range [dt1, dt2] into consecutive, non-overlapping windows spanning `days` days each."""
+    starts = pd.date_range(pd.Timestamp(dt1), pd.Timestamp(dt2), freq=pd.Timedelta(days=days))
+    ends = list(starts[1:] - pd.Timedelta(seconds=1)) + [pd.Timestamp(dt2)]
+    fmt = '%Y-%m-%d %H:%M:%S'
+    return [(s.strftime(fmt), e.strftime(fmt)) for s, e in zip(starts, ends)]
+
+
+def chunked_histogram(table, variable, dt1, dt2, lat1, lat2, lon1, lon2, depth1, depth2, chunkDays, bins=50, exportDataFlag=False):
+    """
+    Accumulates the histogram of a variable over a space-time domain by retrieving the data in time chunks of `chunkDays` days.
+    Only one chunk is held in memory at a time. The initial bins span the range of the first non-empty (warm-up) chunk; 
+    whenever a subsequent chunk falls outside the bins, they are extended (and coarsened if needed) to cover it, so no value is dropped.
+    Returns a sketch.StreamingHistogram, or None if no data is found.
+    If exportDataFlag is True, each chunk is exported to a separate file.
+    """   
+    hist = None
+    for k, (t1, t2) in enumerate(time_chunks(dt1, dt2, chunkDays)):
+        data = API().space_time(table, variable, t1, t2, lat1, lat2, lon1, lon2, depth1, depth2)
+        if len(data) < 1: continue
+        if exportDataFlag:
+            metadata = API().get_metadata(table, variable)
+            fname = make_filename_by_table_var(table, variable, prefix='Hist') + '_%d' % k
+            Export(data, metadata, fname).save()
+        values = pd.to_numeric(data[variable], errors='coerce').to_numpy(dtype=float)
+        if hist is None: hist = StreamingHistogram.from_sketch(QuantileSketch().update(values), bins)
+        hist.update(values, extend=True)
+    if hist is not None and hist.underflow + hist.overflow > 0:
+        print_tqdm('%s: %d values fell outside the histogram bins.' % (variable, hist.underflow + hist.overflow), err=True)
+    return hist
+
+
+def plot_hist(tables, variables, dt1, dt2, lat1, lat2, lon1, lon2, depth1, depth2, exportDataFlag=False, show=True, chunkDays=None):
     """
     Create histogram graph for each variable within a predefined space-time domain. 
+    If chunkDays is set, the data are retrieved and binned in time chunks of `chunkDays` days (see `chunked_histogram`),
+    so that the space-time domain does not have to fit in memory.
     Returns the generated graph objects in form of a python list. 
     """   
     gos = []
     for i in tqdm(range(len(tables)), desc='overall'):
-        data = API().space_time(tables[i], variables[i], dt1, dt2, lat1, lat2, lon1, lon2, depth1, depth2)
-        if len(data) < 1:
+        if chunkDays is None:
+            data = API().space_time(tables[i], variables[i], dt1, dt2, lat1, lat2, lon1, lon2, depth1, depth2)
+        else:
+            data = None
+            hist = chunked_histogram(tables[i], variables[i], dt1, dt2, lat1, lat2, lon1, lon2, depth1, depth2, chunkDays, exportDataFlag=exportDataFlag)
+        if (data is not None and len(data) < 1) or (data is None and hist is None):
             no_data_reaction(i+1, tables[i], variables[i], dt1, dt2, lat1, lat2, lon1, lon2, depth1, depth2)
             continue
         print_tqdm('%d: %s retrieved (%s).' % (i+1, variables[i], tables[i]), err=False)
 
-        if exportDataFlag:
+        if exportDataFlag and data is not None:
             metadata = API().get_metadata(tables[i], variables[i])
             fname = make_filename_by_table_var(tables[i], variables[i], prefix='Hist')
             Export(data, metadata, fname).save()
 
         go = Hist(data, variables[i]).graph_obj()        
+        if data is None: go.histogram = hist
         go.unit = API().get_unit(tables[i], variables[i])
         go.xlabel = variables[i] + go.unit
         go.ylabel = ''
@@ -75,9 +116,10 @@ def plot_hist(tables, variables, dt1, dt2, lat1, lat2, lon1, lon2, depth1, depth
 
 
 
-def plot_map(tables, variables, dt1, dt2, lat1, lat2, lon1, lon2, depth1, depth2, exportDataFlag=False, show=True, levels=0, surface3D=False):
+def plot_map(tables, variables, dt1, dt2, lat1, lat2, lon1, lon2, depth1, depth2, exportDataFlag=False, show=True, levels=0, surface3D=False, slider=False):
     """
     Create individual map graphs per each depth level using gridded data. 
+    If slider is True, all time/depth layers are displayed in a single figure with a layer slider.
     In the case of sparse data set, data is superimposed on a geospatial map.
     Returns the generated graph objects in form of a python list. 
     """   
@@ -95,7 +137,9 @@ def plot_map(tables, variables, dt1, dt2, lat1, lat2, lon1, lon2, depth1, depth2
             Export(data, metadata, fname).save()
 
         if API().is_grid(tables[i], variables[i]):
-            go = Map(data, variables[i], levels, surface3D).graph_obj()  
+            limitsKey = ('map', tables[i], variables[i], dt1, dt2, lat1, lat2, lon1, lon2, depth1, depth2)
+            go = Map(data, variables[i], levels, surface3D, limitsKey).graph_obj()  
+            go.slider = slider
             go.unit = API().get_unit(tables[i], variables[i])       
             go.xlabel = 'Longitude'
             go.ylabel = 'Latitude'
@@ -139,7 +183,8 @@ def plot_section(tables, variables, dt1, dt2, lat1, lat2, lon1, lon2, depth1, de
             fname = make_filename_by_table_var(tables[i], variables[i], prefix='Section')
             Export(data, metadata, fname).save()
 
-        go = Section(data, variables[i], levels).graph_obj()  
+        limitsKey = ('section', tables[i], variables[i], dt1, dt2, lat1, lat2, lon1, lon2, depth1, depth2)
+        go = Section(data, variables[i], levels, limitsKey).graph_obj()  
         go.unit = API().get_unit(tables[i], variables[i])       
         go.ylabel = 'depth [m]'
         go.width, go.height = 1000, 500
@@ -375,12 +420,13 @@ def plot_xy(
             ):
     """
     Plots one variable against the other.
+    If all the plots have the same x values, they share a single data source (bokeh) so that their selections are linked.
     Returns the generated graph objects.
     """   
 
     # TO DO: add input validation here
 
-    gos = []
+    matched = []
     for i in tqdm(range(len(xTables)), desc='overall'):
         data = API().match(
                         xTables[i], xVars[i], yTables[i], yVars[i], 
@@ -396,8 +442,15 @@ def plot_xy(
             metadata = API().get_metadata([xTables[i]] + [yTables[i]], [xVars[i]] + [yVars[i]])
             fname = make_filename_by_table_var(xVars[i], yVars[i], prefix='XY')
             Export(data, metadata, fname).save()
+        matched.append((i, data))
 
+    source = None
+    if get_vizEngine().lower().strip() == 'bokeh':
+        source = Trend.shared_source([data[xVars[i]] for i, data in matched], [data[yVars[i]] for i, data in matched])
+    gos = []
+    for k, (i, data) in enumerate(matched):
         go = Trend(data, yVars[i]).graph_obj()
+        if source is not None: go.source, go.sourceColumns = source, ('x', 'y%d' % k)
         go.line = False
         go.timeSeries = False
         go.x = data[xVars[i]]  
@@ -414,14 +467,13 @@ def plot_xy(
 
 
 
-def plot_cruise_track(cruise, stations=None):
-    """Plots cruise track on folium map."""
-    if isinstance(cruise, str): cruise = [cruise]
-    df = pd.DataFrame({})
-    for cru in cruise:
-        track = API().cruise_trajectory(cru)
-        track['cruise'] = cru
-        print_tqdm('%s cruise track retrieved.' % cru, err=False)
-        df = df.append(track, ignore_index=True)
+def plot_cruise_track(cruise, stations=None, tolerance=None):
+    """
+    Plots cruise track on folium map. 
+    If `tolerance` [degrees] is set, the tracks are simplified (Douglas-Peucker) before plotting.
+    """
+    df = API().cruise_trajectories(cruise, tolerance=tolerance)
+    if len(df) < 1: halt('No cruise trajectory found.')
+    for cru in df['cruise'].unique(): print_tqdm('%s cruise track retrieved.' % cru, err=False)
     folium_cruise_track(df, stations)
     return
\ No newline at end of file
@@ -0,0 +1,62 @@
+"""
+Parse-throughput benchmark of the REST client responses: Arrow IPC stream vs CSV.
+Times the body parsing alone and the end-to-end query against the local mock server.
+
+    PYTHONPATH=. python tests/benchmark_arrow.py [rows] [repeats]
+"""
+
+import io
+import sys
+import time
+import numpy as np
+import pandas as pd
+from pycmap import rest
+from mockServer import MockServer
+
+
+
+def make_frame(rows):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+                        'time': pd.Timestamp('2016-01-01') + pd.to_timedelta(np.arange(rows) % 8760, unit='h'),
+                        'lat': rng.uniform(-90, 90, rows),
+                        'lon': rng.uniform(-180, 180, rows),
+                        'depth': rng.uniform(0, 500, rows),
+                        'sst': rng.normal(20, 3, rows),
+                        'chl': rng.lognormal(size=rows)
+                        })
+
+
+def best_of(fn, repeats):
+    timings = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - t0)
+    return min(timings)
+
+
+def main(rows=1000000, repeats=3):
+    rest.save_config = lambda **kwargs: None
+    frame = make_frame(rows)
+    with MockServer(frame, arrow=True) as arrowServer, MockServer(frame, arrow=False) as csvServer:
+        csvText = csvServer.csvBody.decode()
+        parse = {
+                'csv': best_of(lambda: pd.read_csv(io.StringIO(csvText)), repeats),
+                'arrow': best_of(lambda: rest._REST._read_arrow(arrowServer.arrowBody), repeats)
+                }
+        clients = {
+                  'csv': rest._REST(token='benchmark', baseURL=csvServer.baseURL),
+                  'arrow': rest._REST(token='benchmark', baseURL=arrowServer.baseURL)
+                  }
+        query = {fmt: best_of(lambda: client.query('SELECT * FROM tblBenchmark'), repeats) for fmt, client in clients.items()}
+    sizes = {'csv': len(csvServer.csvBody), 'arrow': len(arrowServer.arrowBody)}
+    print('%d rows, best of %d' % (rows, repeats))
+    print('%-6s %12s %14s %14s %16s' % ('format', 'body [MB]', 'parse [s]', 'rows/s', 'query [s]'))
+    for fmt in ('csv', 'arrow'):
+        print('%-6s %12.1f %14.3f %14.0f %16.3f' % (fmt, sizes[fmt] / 1024**2, parse[fmt], rows / parse[fmt], query[fmt]))
+
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:3]])
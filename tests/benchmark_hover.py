@@ -0,0 +1,63 @@
+"""
+Map hover benchmark: per-layer trace construction time and html size of a 1440 x 720 (0.25 degree) global grid,
+with per-cell hover strings (the former MapPlotly implementation) and with a single hovertemplate (current).
+The template variant builds the same trace as MapPlotly.render (heatmap, without level of detail).
+
+    PYTHONPATH=. python tests/benchmark_hover.py [layers]
+"""
+
+import sys
+import time
+import numpy as np
+import plotly.io as pio
+import plotly.graph_objs as go
+
+
+
+VARIABLE, UNIT = 'sst', ' [C]'
+
+
+def make_grid():
+    lat = np.arange(-89.875, 90, 0.25)
+    lon = np.arange(-179.875, 180, 0.25)
+    layer = 15 + 10 * np.cos(np.deg2rad(lat))[:, None] * np.ones(len(lon))
+    return lat, lon, layer
+
+
+def hovertext_trace(lon, lat, vals):
+    hovertext = []
+    for k in range(len(vals)):
+        hovertext.append('lon: {:.2f}<br>lat: {:.2f}<br>{}: {:.1e}'.format(lon[k], lat[k], VARIABLE + UNIT, vals[k]))
+    return go.Heatmap(x=lon, y=lat, z=vals, hoverinfo='text', text=hovertext)
+
+
+def hovertemplate_trace(lon, lat, vals):
+    hovertemplate = 'lon: %{x:.2f}<br>lat: %{y:.2f}<br>' + VARIABLE + UNIT + ': %{z:.1e}<extra></extra>'
+    return go.Heatmap(x=lon, y=lat, z=vals, hovertemplate=hovertemplate)
+
+
+def per_layer(build, lon, lat, vals, layers):
+    t0 = time.perf_counter()
+    for _ in range(layers): trace = build(lon, lat, vals)
+    elapsed = (time.perf_counter() - t0) / layers
+    html = pio.to_html(go.Figure(data=[trace]), include_plotlyjs=False, full_html=False)
+    return elapsed, len(html)
+
+
+def main(layers=3):
+    lat, lon, layer = make_grid()
+    LON, LAT = np.meshgrid(lon, lat)
+    lonFlat, latFlat, vals = LON.flatten(), LAT.flatten(), layer.flatten()
+    print('%d x %d grid (%d cells), %d layer(s)' % (len(lon), len(lat), vals.size, layers))
+    results = {
+              'per-cell hovertext': per_layer(hovertext_trace, lonFlat, latFlat, vals, layers),
+              'hovertemplate': per_layer(hovertemplate_trace, lonFlat, latFlat, vals, layers)
+              }
+    print('%-20s %18s %14s' % ('hover', 'trace/layer [s]', 'html [MB]'))
+    for label, (elapsed, size) in results.items():
+        print('%-20s %18.3f %14.1f' % (label, elapsed, size / 1024**2))
+
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
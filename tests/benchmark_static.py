@@ -0,0 +1,51 @@
+"""
+Static export benchmark: one `write_image` call per figure vs the BatchRenderer (persistent renderer per worker).
+Requires kaleido and a Chrome installation (`plotly_get_chrome`).
+
+    PYTHONPATH=. python tests/benchmark_static.py [figures] [workers]
+"""
+
+import os
+import sys
+import time
+import tempfile
+import numpy as np
+import plotly.io as pio
+import plotly.graph_objs as go
+from pycmap.staticExport import BatchRenderer
+
+
+
+def make_figures(count):
+    rng = np.random.default_rng(0)
+    return [go.Figure(go.Heatmap(z=rng.random((90, 180)))) for _ in range(count)]
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    fn()
+    return time.perf_counter() - t0
+
+
+def main(count=20, workers=None):
+    figures = make_figures(count)
+    with tempfile.TemporaryDirectory() as folder:
+        paths = [os.path.join(folder, 'fig%d.png' % i) for i in range(count)]
+        sequential = timed(lambda: [pio.write_image(fig, path) for fig, path in zip(figures, paths)])
+        timings = {'write_image per figure': sequential}
+        for n in sorted({1, workers or os.cpu_count() or 1}):
+            renderer = BatchRenderer(workers=n)
+            # the worker start-up (including the renderer) is timed separately from the rendering
+            startup = timed(lambda: [f.result() for f in [renderer._pool.submit(time.sleep, 0) for _ in range(n)]])
+            timings['BatchRenderer, %d worker(s)' % n] = timed(lambda: renderer.render_all(figures, paths))
+            timings['  (start-up, %d worker(s))' % n] = startup
+            renderer.close()
+    print('%d figures' % count)
+    for label, seconds in timings.items():
+        speedup = '' if label.startswith('  ') else '%6.1fx' % (sequential / seconds)
+        print('%-32s %8.2f s %s' % (label, seconds, speedup))
+
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:3]])
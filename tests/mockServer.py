@@ -0,0 +1,89 @@
+"""
+A local stand-in of the CMAP query endpoint, used by the tests and benchmarks of the REST client.
+The server answers every query with the same dataframe, as an Arrow IPC stream if the client accepts it
+(and the server is arrow-enabled), otherwise as CSV. Failures can be injected per server name (see `MockServer.faults`).
+"""
+
+import io
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import pyarrow as pa
+from pycmap.rest import ARROW_STREAM_MEDIA_TYPE
+
+
+
+class MockServer(object):
+    """
+    Serves `frame` at http://127.0.0.1:<port>/api/data/query on a background thread.
+    Use as a context manager; `baseURL` is the root endpoint to pass to the client.
+    """
+
+    def __init__(self, frame, arrow=True):
+        """
+        :param dataframe frame: the dataframe returned for every query.
+        :param bool arrow: if False, the server ignores the Accept header and always responds with CSV (like the current CMAP servers).
+        """
+        self.arrow = arrow
+        self.requests = []
+        # server name -> list of faults applied to its next requests (in order): an http status code, 
+        # or 'truncate' to drop the connection in the middle of the body
+        self.faults = {}
+        self.set_frame(frame)
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                accept = self.headers.get('Accept', '')
+                query = parse_qs(url.query)
+                server.requests.append({'path': url.path, 'query': query, 'accept': accept})
+                faults = server.faults.get(query.get('servername', [None])[0])
+                fault = faults.pop(0) if faults else None
+                if isinstance(fault, int):
+                    body = b'injected failure'
+                    self.send_response(fault)
+                    self.send_header('Content-Type', 'text/plain')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                    return
+                if server.arrow and ARROW_STREAM_MEDIA_TYPE in accept:
+                    body, contentType = server.arrowBody, ARROW_STREAM_MEDIA_TYPE
+                else:
+                    body, contentType = server.csvBody, 'text/csv; charset=utf-8'
+                self.send_response(200)
+                self.send_header('Content-Type', contentType)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                if fault == 'truncate':
+                    self.wfile.write(body[:len(body) // 2])
+                    self.close_connection = True
+                    return
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.baseURL = 'http://127.0.0.1:%d' % self._httpd.server_address[1]
+
+
+    def set_frame(self, frame):
+        """Encodes the dataframe returned by the server, once per format."""
+        self.csvBody = frame.to_csv(index=False).encode()
+        sink = io.BytesIO()
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        with pa.ipc.new_stream(sink, table.schema) as writer: writer.write_table(table)
+        self.arrowBody = sink.getvalue()
+
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+
+    def __exit__(self, *exc):
+        self._httpd.shutdown()
+        self._httpd.server_close()
@@ -0,0 +1,28 @@
+"""
+Tests of the palette registry of the colorMaps module.
+"""
+
+import numpy as np
+import matplotlib
+import cmocean
+from pycmap.colorMaps import PALETTES, getPalette
+
+
+
+def test_named_and_object_colormaps():
+    for cmap in ('viridis', matplotlib.colormaps['magma'], cmocean.cm.balance):
+        colormap = matplotlib.colormaps[cmap] if isinstance(cmap, str) else cmap
+        expected = np.round(colormap(np.linspace(0, 1, 256))[:, :3] * 255).astype(np.uint8)
+        assert np.array_equal(PALETTES.lut(cmap), expected)
+        palette = PALETTES.bokeh(cmap)
+        assert len(palette) == colormap.N and palette[0] == '#%02x%02x%02x' % tuple(expected[0])
+        colorscale = PALETTES.plotly(cmap)
+        assert colorscale[0][0] == 0 and colorscale[-1][0] == 1
+        assert all(isinstance(c, str) and c.startswith('rgb(') for _, c in colorscale)
+
+
+def test_tables_are_memoized():
+    cmap = getPalette('sst')
+    assert PALETTES.bokeh(cmap) is PALETTES.bokeh(cmap)
+    assert PALETTES.plotly(cmap) is PALETTES.plotly(cmap)
+    assert not PALETTES.lut(cmap).flags.writeable
@@ -0,0 +1,41 @@
+"""
+Tests of the cached data limits of the common module.
+"""
+
+import numpy as np
+from pycmap import common
+
+
+
+def test_data_limits_cache_is_bounded_and_expires(monkeypatch):
+    common.clear_data_limits_cache()
+    monkeypatch.setattr(common, 'DATA_LIMITS_CACHE_SIZE', 3)
+    data = np.arange(1000.)
+    for k in range(5): common.get_data_limits(data, key=('tbl', 'var', k))
+    assert len(common._dataLimitsCache) == 3
+    # a cached key ignores the data until the entry expires
+    assert common.get_data_limits(data + 500, key=('tbl', 'var', 4)) == common.get_data_limits(data, key=('tbl', 'var', 4))
+    monkeypatch.setattr(common, 'DATA_LIMITS_TTL', 0)
+    assert common.get_data_limits(data + 500, key=('tbl', 'var', 4))[0] > 500
+    common.clear_data_limits_cache()
+    assert len(common._dataLimitsCache) == 0
+
+
+def test_compact_dataframe_keeps_precision():
+    import pandas as pd
+    df = pd.DataFrame({
+                      'big_integers': [16777217.0, 20000001.0, np.nan],
+                      'round_values': [16000000.0, 20000000.0, np.nan],
+                      'measurements': [12.3456, -0.000123, 1e5],
+                      'full_precision': [0.1234567891, 2.5, 3.0]
+                      })
+    original = df.copy()
+    compacted, report = common.compact_dataframe(df)
+    assert compacted['big_integers'].dtype == np.float64
+    assert compacted['full_precision'].dtype == np.float64
+    assert compacted['round_values'].dtype == np.float32
+    assert compacted['measurements'].dtype == np.float32
+    for col in compacted.columns:
+        restored = common.significant_round(compacted[col].to_numpy(dtype=np.float64), 6) if compacted[col].dtype == np.float32 else compacted[col]
+        assert np.allclose(restored, original[col], rtol=1e-12, atol=0, equal_nan=True)
+    assert np.array_equal(compacted['big_integers'], original['big_integers'], equal_nan=True)
@@ -0,0 +1,94 @@
+"""
+Tests of the retry, circuit breaker, and failover paths of the REST client, against a local mock server.
+"""
+
+import time
+import uuid
+import numpy as np
+import pandas as pd
+import pytest
+from pycmap import rest
+from pycmap.resilience import RetryPolicy, CircuitBreaker, get_breaker
+from mockServer import MockServer
+
+
+
+FAST = RetryPolicy(maxRetries=3, baseDelay=0.01, maxDelay=0.02, circuitWait=5)
+
+
+@pytest.fixture(autouse=True)
+def no_config(monkeypatch):
+    monkeypatch.setattr(rest, 'save_config', lambda **kwargs: None)
+
+
+@pytest.fixture
+def server():
+    with MockServer(pd.DataFrame({'lat': np.arange(100.), 'sst': np.ones(100)})) as s:
+        yield s
+
+
+def _name():
+    # breakers and server statistics are shared by all clients; each test uses its own server names
+    return 'server-' + uuid.uuid4().hex[:8]
+
+
+def _client(baseURL):
+    return rest._REST(token='test-token', baseURL=baseURL, retryPolicy=FAST)
+
+
+
+def test_transient_status_is_retried(server):
+    name = _name()
+    server.faults[name] = [503, 503]
+    df = _client(server.baseURL).query('SELECT 1', servers=[name])
+    assert len(df) == 100 and df.attrs['retries'] == 2
+    assert get_breaker(name, server.baseURL).state == CircuitBreaker.CLOSED
+
+
+def test_interrupted_transfer_is_retried(server):
+    name = _name()
+    server.faults[name] = ['truncate']
+    df = _client(server.baseURL).query('SELECT 1', servers=[name])
+    assert len(df) == 100 and df.attrs['retries'] == 1
+
+
+def test_client_error_is_not_retried(server):
+    name = _name()
+    server.faults[name] = [400, 400]
+    df = _client(server.baseURL).query('SELECT 1', servers=[name])
+    assert len(df) == 0
+    assert df.attrs['error']['status_code'] == 400 and df.attrs['error']['retryable'] is False
+    assert len(server.requests) == 1
+    assert get_breaker(name, server.baseURL).state == CircuitBreaker.CLOSED
+
+
+def test_breakers_are_per_endpoint(server):
+    name = _name()
+    dead = 'http://127.0.0.1:9'
+    client = rest._REST(token='test-token', baseURL=dead, retryPolicy=RetryPolicy(maxRetries=5, baseDelay=0.01, maxDelay=0.01, circuitWait=0))
+    assert 'error' in client.query('SELECT 1', servers=[name]).attrs
+    assert get_breaker(name, dead).state == CircuitBreaker.OPEN
+    # the same server name behind a healthy endpoint is not affected
+    df = _client(server.baseURL).query('SELECT 1', servers=[name])
+    assert len(df) == 100
+
+
+def test_open_circuit_is_waited_out(server):
+    name = _name()
+    breaker = get_breaker(name, server.baseURL)
+    breaker.resetTimeout = 0.3
+    for _ in range(breaker.failureThreshold): breaker.record_failure()
+    start = time.monotonic()
+    df = _client(server.baseURL).query('SELECT 1', servers=[name])
+    assert len(df) == 100
+    assert time.monotonic() - start >= 0.2
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_failover_to_next_server(server):
+    primary, secondary = _name(), _name()
+    server.faults[primary] = [503] * 10
+    for _ in range(3):
+        df = _client(server.baseURL).query('SELECT %f' % time.time(), servers=[primary, secondary])
+        assert len(df) == 100
+    assert any(r['query']['servername'] == [secondary] for r in server.requests)
@@ -0,0 +1,98 @@
+"""
+Tests of the response negotiation (Arrow IPC stream with CSV fallback) of the REST client, against a local mock server.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from pycmap import rest
+from mockServer import MockServer
+
+
+
+def _frame(n=1000):
+    rng = np.random.default_rng(0)
+    sst = rng.normal(20, 3, n)
+    sst[::7] = np.nan
+    return pd.DataFrame({
+                        'time': pd.Timestamp('2016-01-01') + pd.to_timedelta(np.arange(n), unit='h'),
+                        'lat': rng.uniform(-90, 90, n),
+                        'lon': rng.uniform(-180, 180, n),
+                        'depth': rng.uniform(0, 500, n),
+                        'sst': sst,
+                        'cruise': np.where(np.arange(n) % 2, 'KM1906', 'KOK1606')
+                        })
+
+
+@pytest.fixture(autouse=True)
+def no_config(monkeypatch):
+    # the client stores its configs next to the package; keep the tests side-effect free
+    monkeypatch.setattr(rest, 'save_config', lambda **kwargs: None)
+
+
+def _query(server, **kwargs):
+    client = rest._REST(token='test-token', baseURL=server.baseURL, **kwargs)
+    return client.query('SELECT * FROM tblTest', servers=['rainier'])
+
+
+
+def test_arrow_and_csv_responses_match():
+    frame = _frame()
+    with MockServer(frame, arrow=True) as arrowServer, MockServer(frame, arrow=False) as csvServer:
+        fromArrow = _query(arrowServer)
+        fromCSV = _query(csvServer)
+    assert rest.ARROW_STREAM_MEDIA_TYPE in arrowServer.requests[0]['accept']
+    assert 'error' not in fromArrow.attrs and 'error' not in fromCSV.attrs
+    # the time column is formatted the same way regardless of the response format
+    assert fromArrow['time'].iloc[1] == fromCSV['time'].iloc[1] == '2016-01-01T01:00:00'
+    pd.testing.assert_frame_equal(fromArrow, fromCSV, check_dtype=False)
+
+
+def test_csv_fallback_when_server_ignores_arrow():
+    frame = _frame()
+    with MockServer(frame, arrow=False) as server:
+        df = _query(server)
+    assert rest.ARROW_STREAM_MEDIA_TYPE in server.requests[0]['accept']
+    assert len(df) == len(frame) and list(df.columns) == list(frame.columns)
+    assert np.allclose(df['sst'], frame['sst'], equal_nan=True)
+
+
+def test_csv_only_without_pyarrow(monkeypatch):
+    frame = _frame(10)
+    monkeypatch.setattr(rest, 'pa', None)
+    with MockServer(frame, arrow=True) as server:
+        df = _query(server)
+    assert rest.ARROW_STREAM_MEDIA_TYPE not in server.requests[0]['accept']
+    assert len(df) == 10
+
+
+def test_memory_profile_keeps_datetime():
+    frame = _frame()
+    with MockServer(frame, arrow=True) as arrowServer, MockServer(frame, arrow=False) as csvServer:
+        fromArrow = _query(arrowServer, memoryProfile=True)
+        fromCSV = _query(csvServer, memoryProfile=True)
+    assert pd.api.types.is_datetime64_any_dtype(fromArrow['time'])
+    assert pd.api.types.is_datetime64_any_dtype(fromCSV['time'])
+    assert (fromArrow['time'].values == fromCSV['time'].values).all()
+
+
+def test_metadata_cache_per_endpoint_and_ttl(monkeypatch):
+    rest._REST.clear_metadata_cache()
+    metadata = pd.DataFrame({'Variable': ['sst'], 'Unit': ['C']})
+    with MockServer(metadata) as first, MockServer(metadata) as second:
+        client = rest._REST(token='test-token', baseURL=first.baseURL)
+        assert len(client.get_metadata('tblTest', 'sst')) == 1
+        fetched = len(first.requests)
+        client.get_metadata(['tblTest', 'tblTest'], ['sst', 'sst'])
+        assert len(first.requests) == fetched
+        # another endpoint does not reuse the metadata of the first one
+        rest._REST(token='test-token', baseURL=second.baseURL).get_metadata('tblTest', 'sst')
+        assert len(second.requests) == fetched
+        monkeypatch.setattr(rest._REST, 'METADATA_TTL', 0)
+        client.get_metadata('tblTest', 'sst')
+        assert len(first.requests) == 2 * fetched
+        monkeypatch.setattr(rest._REST, 'METADATA_TTL', 3600)
+        rest._REST.clear_metadata_cache()
+        client.get_metadata('tblTest', 'sst')
+        assert len(first.requests) == 3 * fetched
+    rest._REST.clear_metadata_cache()
@@ -0,0 +1,195 @@
+"""
+Tests of the colocalization queries of the sample module.
+The queries are executed against a local SQL stand-in (an in-memory sqlite database) instead of the CMAP servers.
+"""
+
+import re
+import sqlite3
+import threading
+from urllib.parse import urlencode
+import numpy as np
+import pandas as pd
+import pytest
+from pycmap import sample
+from pycmap.progress import ProgressSink
+
+
+
+# sqlite has no table value constructor with column aliases; the inline VALUES table is rewritten as a CTE
+VALUES_TABLE = re.compile(r"FROM \(VALUES (.*)\) AS s\(([^)]*)\)")
+
+
+class SQLStandIn(object):
+    """Answers the queries of the sample module from an in-memory sqlite database (mimics `API.query`)."""
+
+    def __init__(self, tables):
+        self.conn = sqlite3.connect(":memory:", check_same_thread=False)
+        for name, df in tables.items(): df.to_sql(name, self.conn, index=False)
+        self.queries = []
+
+    def query(self, query, servers=None):
+        self.queries.append(query)
+        m = VALUES_TABLE.search(query)
+        if m is not None:
+            query = f"WITH s({m.group(2)}) AS (VALUES {m.group(1)}) " + query[:m.start()] + "FROM s" + query[m.end():]
+        return pd.read_sql_query(query, self.conn)
+
+
+
+def _target_table(seed, n=4000):
+    rng = np.random.default_rng(seed)
+    times = pd.Timestamp("2016-01-01") + pd.to_timedelta(rng.integers(0, 60 * 86400, n), unit="s")
+    return pd.DataFrame({
+                        "time": times.strftime(sample.QUERY_DT_FORMAT),
+                        "month": times.month,
+                        "lat": rng.uniform(-5, 5, n),
+                        "lon": rng.uniform(-5, 5, n),
+                        "depth": rng.uniform(0, 100, n),
+                        "sst": rng.normal(20, 3, n)
+                        })
+
+
+def _source(seed, n=300):
+    rng = np.random.default_rng(seed)
+    times = pd.Timestamp("2016-01-05") + pd.to_timedelta(rng.integers(0, 50 * 86400, n), unit="s")
+    return pd.DataFrame({
+                        "time": times.strftime("%Y-%m-%dT%H:%M:%S"),
+                        "lat": rng.uniform(-5, 5, n),
+                        "lon": rng.uniform(-5, 5, n),
+                        "depth": rng.uniform(0, 100, n)
+                        })
+
+
+def _targets():
+    aggregations = sample._resolve_aggregations(["AVG", "COUNT"])
+    targets = {
+              "tblSurface": {"variables": ["sst"], "tolerances": [1, 0.5, 0.5, 5], "hasDepth": False, "isClimatology": False},
+              "tblProfile": {"variables": ["sst"], "tolerances": [2, 0.5, 0.5, 10], "hasDepth": True, "isClimatology": False},
+              "tblClimatology": {"variables": ["sst"], "tolerances": [0, 0.5, 0.5, 10], "hasDepth": True, "isClimatology": True}
+              }
+    for table, env in targets.items():
+        env["aggregations"] = aggregations
+        env["aliases"] = [a for v in env["variables"] for a in sample.alias(v, table, aggregations)]
+    return targets
+
+
+@pytest.fixture
+def standIn():
+    return SQLStandIn({"tblSurface": _target_table(1), "tblProfile": _target_table(2), "tblClimatology": _target_table(3)})
+
+
+
+def test_block_matches_point_queries(standIn):
+    source, targets = _source(10), _targets()
+    windows = sample.time_windows(source["time"], targets, False)
+    lats, lons, depths = (source[c].to_numpy(dtype=float) for c in ("lat", "lon", "depth"))
+    rows = np.arange(len(source))
+    blocks = sample.match_block(standIn, targets, windows, rows, lats, lons, depths, servers=None)
+    assert blocks.notna().any().all()
+    for i in rows:
+        expected = sample.match(standIn, targets, windows, i, lats[i], lons[i], depths[i], servers=None)
+        for v in blocks.columns:
+            got = blocks.loc[i, v] if i in blocks.index else np.nan
+            want = expected.get(v, np.nan)
+            want = np.nan if want is None else want
+            # the block queries use coordinates rounded to BOUND_DECIMALS
+            assert np.isclose(got, want, equal_nan=True, rtol=1e-6), (i, v, got, want)
+
+
+def test_block_queries_fit_url_limit(standIn):
+    source, targets = _source(11, n=2000), _targets()
+    windows = sample.time_windows(source["time"], targets, False)
+    lats, lons, depths = (source[c].to_numpy(dtype=float) for c in ("lat", "lon", "depth"))
+    queries = sample.block_queries("tblProfile", targets["tblProfile"], windows["tblProfile"], np.arange(500), lats, lons, depths, False)
+    assert len(queries) > 1
+    assert all(len(urlencode({"query": q})) <= sample.MAX_BLOCK_QUERY_LENGTH for q in queries)
+    # all of the points are covered exactly once
+    ids = [int(i) for q in queries for i in re.findall(r"\((\d+),'", q)]
+    assert sorted(ids) == list(range(500))
+    # coordinates are rounded
+    assert not re.search(r"\d\.\d{%d,}" % (sample.BOUND_DECIMALS + 1), queries[0])
+
+
+def test_sample_blocks_end_to_end(standIn, monkeypatch):
+    source = _source(12, n=200)
+    source = pd.concat([source, source.iloc[:20]], ignore_index=True)
+    targets = {table: {"variables": env["variables"], "tolerances": env["tolerances"]} for table, env in _targets().items()}
+    hasDepth = {"tblSurface": False, "tblProfile": True, "tblClimatology": True}
+    standIn._validate_table_var = lambda table, variable: None
+    standIn.has_field = lambda table, field, servers=None: hasDepth[table]
+    standIn.is_climatology = lambda table, servers=None: table == "tblClimatology"
+    monkeypatch.setattr(sample, "API", lambda: standIn)
+    monkeypatch.setattr(sample.COVERAGE, "coverage", lambda api, table, servers: {"startTime": None, "endTime": None})
+    pointwise = sample.Sample(source, targets, agg_fun=["AVG"], progress=ProgressSink())
+    blockwise = sample.Sample(source, targets, agg_fun=["AVG"], progress=ProgressSink(), blockSize=sample.BLOCK_SIZE)
+    pd.testing.assert_frame_equal(pointwise, blockwise, check_exact=False, rtol=1e-6)
+    assert blockwise.attrs["sampling_report"]["unique_points"] == 200
+
+
+def test_mixed_time_layouts():
+    times = pd.Series(["2016-01-01T06:00:00", "2016-01-01T06:00:00.2", "2016-01-02", "2016-01-02T03:00:00Z", "2016-01-02T05:00:00+02:00"])
+    parsed = sample._to_naive(times)
+    assert parsed.dt.tz is None
+    assert list(parsed) == [
+                           pd.Timestamp("2016-01-01 06:00:00"), 
+                           pd.Timestamp("2016-01-01 06:00:00.2"), 
+                           pd.Timestamp("2016-01-02"),
+                           pd.Timestamp("2016-01-02 03:00:00"),
+                           pd.Timestamp("2016-01-02 03:00:00")
+                           ]
+    assert list(sample._to_naive(pd.Series(["01/02/2016 06:00", "2016-01-03"]))) == [pd.Timestamp("2016-01-02 06:00"), pd.Timestamp("2016-01-03")]
+    targets = {"tblA": {"tolerances": [1, 0.25, 0.25, 5], "isClimatology": False}}
+    windows = sample.time_windows(times, targets, False)
+    assert list(windows["tblA"]["lower"][:3]) == ["2015-12-31 06:00:00", "2015-12-31 06:00:00", "2016-01-01 00:00:00"]
+    representatives, members = sample.unique_points(times, np.zeros(5), np.zeros(5), np.zeros(5))
+    # times are compared to the second
+    assert len(representatives) == 3
+
+
+class FlakyStandIn(SQLStandIn):
+    """Fails the first `transient` queries, and every query that contains `permanent` (returns an empty frame carrying an error)."""
+
+    def __init__(self, tables, transient=0, permanent=None):
+        super().__init__(tables)
+        self.transient = transient
+        self.permanent = permanent
+        self._lock = threading.Lock()
+
+    def query(self, query, servers=None):
+        with self._lock:
+            fail = self.transient > 0 or (self.permanent is not None and self.permanent in query)
+            self.transient -= 1
+        if fail:
+            df = pd.DataFrame({})
+            df.attrs["error"] = {"code": "http_error", "message": "injected failure", "status_code": 503, "retryable": True}
+            return df
+        return super().query(query, servers)
+
+
+@pytest.mark.parametrize("blockSize", [None, 20])
+def test_failed_queries_are_retried_and_reported(monkeypatch, blockSize):
+    source = _source(13, n=120)
+    targets = {"tblProfile": {"variables": ["sst"], "tolerances": [2, 0.5, 0.5, 10]}}
+    tables = {"tblProfile": _target_table(2)}
+    # a point that is never answered: its (point-wise) query holds its exact latitude bound
+    permanent = None if blockSize else f"lat BETWEEN {source['lat'][7] - 0.5} AND"
+    flaky = FlakyStandIn(tables, transient=3, permanent=permanent)
+    reference = SQLStandIn(tables)
+    for api in (flaky, reference):
+        api._validate_table_var = lambda table, variable: None
+        api.has_field = lambda table, field, servers=None: True
+        api.is_climatology = lambda table, servers=None: False
+    monkeypatch.setattr(sample.COVERAGE, "coverage", lambda api, table, servers: {"startTime": None, "endTime": None})
+    monkeypatch.setattr(sample, "API", lambda: reference)
+    expected = sample.Sample(source, dict(targets), progress=ProgressSink(), blockSize=blockSize)
+    monkeypatch.setattr(sample, "API", lambda: flaky)
+    sampled = sample.Sample(source, dict(targets), progress=ProgressSink(), blockSize=blockSize)
+    report = sampled.attrs["sampling_report"]
+    assert report["errors"] >= 3
+    if blockSize:
+        assert report["failed_rows"] == []
+        pd.testing.assert_frame_equal(sampled, expected)
+    else:
+        assert report["failed_rows"] == [7]
+        assert sampled.drop(index=7).equals(expected.drop(index=7))
+        assert np.isnan(sampled.loc[7, "CMAP_sst_tblProfile_avg"])
@@ -0,0 +1,35 @@
+"""
+Tests of the streaming summaries of the sketch module.
+"""
+
+import numpy as np
+from pycmap.sketch import QuantileSketch, StreamingHistogram
+
+
+
+def test_extended_histogram_keeps_all_values():
+    rng = np.random.default_rng(0)
+    # a drifting (e.g. seasonal) variable: later chunks fall outside the range of the warm-up chunk
+    chunks = [rng.normal(10 * k, 1, 10000) for k in range(6)] + [np.array([1e4, -1e3])]
+    hist = StreamingHistogram.from_sketch(QuantileSketch().update(chunks[0]), bins=50)
+    for chunk in chunks: hist.update(chunk, extend=True)
+    values = np.concatenate(chunks)
+    assert hist.underflow == hist.overflow == 0
+    assert hist.total == len(values)
+    assert len(hist.counts) <= hist.maxBins
+    assert np.array_equal(hist.counts, np.histogram(values, bins=hist.edges)[0])
+
+
+def test_fixed_histogram_reports_out_of_range_values():
+    hist = StreamingHistogram(np.linspace(0, 1, 11))
+    hist.update([-1, 0.5, 2, 3, np.nan])
+    assert (hist.underflow, hist.overflow, hist.total) == (1, 2, 4)
+
+
+def test_merged_sketches_match_quantiles():
+    rng = np.random.default_rng(1)
+    values = rng.lognormal(size=200000)
+    merged = QuantileSketch(k=1024, seed=0)
+    for chunk in np.array_split(values, 8): merged.merge(QuantileSketch(k=1024, seed=0).update(chunk))
+    q = [0.05, 0.5, 0.95]
+    assert np.allclose(merged.quantile(q), np.quantile(values, q), rtol=0.05)
@@ -0,0 +1,82 @@
+"""
+Tests of the static figure export (png writer and batch renderer).
+"""
+
+import zlib
+import struct
+import numpy as np
+import pytest
+from pycmap import staticExport
+
+
+
+def _chrome_available():
+    import plotly.io as pio
+    import plotly.graph_objs as go
+    try:
+        pio.to_image(go.Figure(), format='png')
+    except Exception:
+        return False
+    return True
+
+
+def _renderer_running():
+    import kaleido
+    return kaleido._global_server.is_running()
+
+
+def _fail():
+    raise ValueError('rendering failed')
+
+
+
+def test_heatmap_png(tmp_path):
+    path = str(tmp_path / 'layer.png')
+    layer = np.arange(12.).reshape(3, 4)
+    layer[0, 0] = np.nan
+    staticExport.heatmap_png(path, layer, 'viridis', 0, 11, scale=2)
+    with open(path, 'rb') as f: png = f.read()
+    assert png[:8] == b'\x89PNG\r\n\x1a\n'
+    width, height = struct.unpack('>II', png[16:24])
+    assert (width, height) == (8, 6)
+    start = png.index(b'IDAT') + 4
+    raw = np.frombuffer(zlib.decompress(png[start:start + struct.unpack('>I', png[start-8:start-4])[0]]), dtype=np.uint8)
+    pixels = raw.reshape(6, 1 + 8 * 4)[:, 1:].reshape(6, 8, 4)
+    # the first layer row is drawn at the bottom; NaN cells are transparent
+    assert pixels[-1, 0, 3] == 0 and pixels[0, 0, 3] == 255
+
+
+def test_workers_keep_a_persistent_renderer():
+    pytest.importorskip('kaleido')
+    with staticExport.BatchRenderer(workers=2) as renderer:
+        running = [renderer._pool.submit(_renderer_running).result() for _ in range(4)]
+    assert all(running)
+
+
+def test_exit_keeps_the_original_exception():
+    with pytest.raises(KeyError):
+        with staticExport.BatchRenderer(workers=1) as renderer:
+            renderer._futures.append(renderer._pool.submit(_fail))
+            raise KeyError('inside the block')
+    assert staticExport.ACTIVE_RENDERER is None
+
+
+def test_close_shuts_down_after_a_rendering_error():
+    renderer = staticExport.BatchRenderer(workers=1)
+    renderer._futures.append(renderer._pool.submit(_fail))
+    with pytest.raises(ValueError):
+        renderer.close()
+    with pytest.raises(RuntimeError):
+        renderer._pool.submit(_renderer_running)
+
+
+def test_render_all(tmp_path):
+    pytest.importorskip('kaleido')
+    if not _chrome_available(): pytest.skip('kaleido cannot find Chrome')
+    import plotly.graph_objs as go
+    figures = [go.Figure(go.Scatter(y=np.random.rand(10))) for _ in range(5)]
+    paths = [str(tmp_path / ('fig%d.png' % i)) for i in range(5)]
+    with staticExport.BatchRenderer(workers=2) as renderer:
+        assert renderer.render_all(figures, paths) == paths
+    for path in paths:
+        with open(path, 'rb') as f: assert f.read(8) == b'\x89PNG\r\n\x1a\n'
@@ -0,0 +1,25 @@
+"""
+Tests of the data source shared by the trend (xy) plots.
+"""
+
+import numpy as np
+import pandas as pd
+from pycmap.trend import Trend
+
+
+
+def test_shared_source_holds_x_and_all_y():
+    x = pd.Series([1.0, 2.0, np.nan, 4.0], index=[5, 6, 7, 8])
+    ys = [pd.Series([10.0, 20.0, 30.0, 40.0]), pd.Series([0.1, 0.2, 0.3, 0.4])]
+    source = Trend.shared_source([x, x.reset_index(drop=True)], ys)
+    assert sorted(source.data) == ['x', 'y0', 'y1']
+    assert np.array_equal(source.data['x'], x.values, equal_nan=True)
+    assert np.array_equal(source.data['y1'], ys[1].values)
+
+
+def test_no_shared_source_for_different_x():
+    x = pd.Series([1.0, 2.0, 3.0])
+    ys = [pd.Series([1.0, 2.0, 3.0])] * 2
+    assert Trend.shared_source([x, x + 1], ys) is None
+    assert Trend.shared_source([x, x[:2]], ys) is None
+    assert Trend.shared_source([x], ys[:1]) is None